@@ -0,0 +1,285 @@
+# apgcode.py
+#
+# Helpers for apgcodes (see http://conwaylife.com/wiki/Apgcode) that don't
+# need Golly.
+#
+# canonise_many gives the same apgcodes as canonise in canonv11.py for a
+# whole list of still lifes and oscillators at once. Instead of reading
+# every cell of the bounding box through getcell in each orientation, the
+# 5-cell strips of each orientation are built straight from the live
+# cells as bitmasks, an orientation is given up as soon as it can't beat
+# the best so far, and patterns that are the same up to translation are
+# only canonised once.
+
+from cellset import CellSet
+from fingerprint import normalised_fingerprint
+from lifesim import coords, life_step
+
+chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+# Based on code by Arie Paap Sept. 2014
+def decodeCanon(canonPatt):
+
+    if not canonPatt or canonPatt[0] != 'x' or '_' not in canonPatt:
+        return []
+
+    blank = False
+    x = y = 0
+    clist = []
+
+    for c in canonPatt[canonPatt.find("_")+1:]:
+
+        if blank:
+            if c == "z":
+                x += 35
+            else:
+                x += chars.index(c)
+                blank = False
+        else:
+            if (c == 'y'):
+                x += 4
+                blank = True
+            elif (c == 'x'):
+                x += 3
+            elif (c == 'w'):
+                x += 2
+            elif (c == 'z'):
+                x = 0
+                y += 5
+            else:
+                v = chars.index(c)
+                for i in range(5):
+                    if v & (1 << i):
+                        clist += [x, y+i]
+                x += 1
+
+    return clist
+
+# The period given by an apgcode's prefix: 1 for still lifes, n for xpn.
+# None for anything else.
+def code_period(apgcode):
+
+    prefix = apgcode.split("_")[0]
+
+    if prefix.startswith("xs"):
+        return 1
+
+    if prefix.startswith("xp") and prefix[2:].isdigit():
+        return int(prefix[2:])
+
+    return None
+
+# Longest period canonise_many looks for
+MAX_PERIOD = 46
+
+# Run a flat cell list until it returns to its starting state. Returns the
+# period and every phase as a list of key sets, or (None, None) if the
+# period is more than max_period.
+def find_phases(cells, max_period=MAX_PERIOD):
+
+    live = CellSet(cells).keys()
+    phases = [live]
+
+    for _ in range(max_period):
+        live = life_step(live)
+        if live == phases[0]:
+            return len(phases), phases
+        phases.append(live)
+
+    return None, None
+
+# The orientations tried by canonise: (a, b, c, d) of the map from (u, w)
+# to (x, y), and whether the origin is on the right and bottom edges of
+# the bounding box rather than the left and top
+ORIENTATIONS = [(1, 0, 0, 1, False, False), (-1, 0, 0, 1, True, False),
+                (1, 0, 0, -1, False, True), (-1, 0, 0, -1, True, True),
+                (0, 1, 1, 0, False, False), (0, -1, 1, 0, True, False),
+                (0, 1, -1, 0, False, True), (0, -1, -1, 0, True, True)]
+
+# The representation of a set of (x, y) pairs in one orientation: the
+# same string canonise in Golly reads cell by cell. With best, None as
+# soon as it is clear that it can't beat or tie best (see encode_cells).
+def encode_orientation(pairs, rect, a, b, c, d, flip_x, flip_y, best="#"):
+
+    x0, y0, width, height = rect
+
+    ox = x0 + width - 1 if flip_x else x0
+    oy = y0 + height - 1 if flip_y else y0
+
+    breadth = width if b else height
+
+    return encode_cells(pairs, breadth, ox, oy, a, b, c, d, best)
+
+# The representation of the live cells in pairs with the origin at (ox, oy)
+# and the cell (ox + a*u + b*w, oy + c*u + d*w) as bit w % 5 of column u
+# of strip w // 5, or None as soon as it is clear that it can't beat or
+# tie best (compared as in compare_representations).
+#
+# The cells are sorted into strips first, so the number of letters that
+# are bound to follow is known: one "z" per strip left to start and one
+# letter per nonzero column. The representation is written a column at a
+# time and given up when those alone would make it longer than best, or
+# when it has already gone past best in lexicographical order and can't
+# end up shorter.
+def encode_cells(pairs, breadth, ox, oy, a, b, c, d, best="#"):
+
+    # The matrix is orthogonal, so its transpose takes (x, y) back to
+    # (u, w)
+    strips = {}
+    for x, y in pairs:
+        u = a * (x - ox) + c * (y - oy)
+        w = b * (x - ox) + d * (y - oy)
+        strip = strips.setdefault(w // 5, {})
+        strip[u] = strip.get(u, 0) | (1 << (w % 5))
+
+    count = (breadth - 1) // 5 + 1
+    bound = count - 1 + sum(len(strip) for strip in strips.values())
+
+    if best == "#":
+        # Nothing to beat
+        limit = None
+    else:
+        limit = len(best)
+        if bound > limit:
+            return None
+
+    representation = []
+    n = 0
+
+    # -1, 0 or 1 as what is written so far is before, the same as or after
+    # the start of best
+    order = 0
+
+    for v in range(count):
+
+        # Each piece is a "z" or a column with the zeroes before it, and
+        # only its last letter was counted in bound
+        pieces = ["z"] if v != 0 else []
+
+        strip = strips.get(v, {})
+        last = -1
+
+        for u in sorted(strip):
+
+            zeroes = u - last - 1
+
+            if zeroes == 0:
+                gap = ""
+            elif zeroes == 1:
+                gap = "0"
+            elif zeroes == 2:
+                gap = "w"
+            elif zeroes == 3:
+                gap = "x"
+            else:
+                gap = "y" + chars[zeroes - 4]
+
+            pieces.append(gap + chars[strip[u]])
+            last = u
+
+        for piece in pieces:
+
+            representation.append(piece)
+
+            if limit is not None:
+
+                bound += len(piece) - 1
+                if bound > limit:
+                    return None
+
+                if order == 0:
+                    start = best[n:n + len(piece)]
+                    if piece != start:
+                        order = -1 if piece < start else 1
+
+                if order == 1 and bound >= limit:
+                    return None
+
+            n += len(piece)
+
+    representation = "".join(representation)
+
+    if compare_representations(best, representation) != representation:
+        return None
+
+    return representation
+
+# Best representation of one phase, or "#" if it doesn't fit in 40 by 40.
+# With best, the best of that and the phase's representation.
+def encode_phase(keys, best="#"):
+
+    pairs = [coords(k) for k in keys]
+    xs = [x for x, _ in pairs]
+    ys = [y for _, y in pairs]
+
+    rect = (min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+
+    if rect[2] > 40 or rect[3] > 40:
+        return best
+
+    # Each orientation is given up as soon as it can't beat or tie the
+    # best so far
+    for orientation in ORIENTATIONS:
+        representation = encode_orientation(pairs, rect, *orientation,
+                                            best=best)
+        if representation is not None:
+            best = representation
+
+    return best
+
+# Compares strings first by length, then by lexicographical ordering.
+# A hash character is worse than anything else.
+def compare_representations(a, b):
+
+    if (a == "#"):
+        return b
+    elif (b == "#"):
+        return a
+    elif (len(a) < len(b)):
+        return a
+    elif (len(b) < len(a)):
+        return b
+    elif (a < b):
+        return a
+    else:
+        return b
+
+def canonise_phases(period, phases):
+
+    if not phases[0]:
+        return "0"
+
+    representation = "#"
+
+    for keys in phases:
+        representation = encode_phase(keys, representation)
+
+    if representation == "#":
+        return representation
+
+    if period == 1:
+        prefix = "xs%d" % len(phases[0])
+    else:
+        prefix = "xp%d" % period
+
+    return prefix + "_" + representation
+
+# The apgcodes of a list of flat cell lists, each a still life or
+# oscillator in any phase, orientation and position. Gives None for any
+# pattern whose period is more than max_period.
+def canonise_many(patterns, max_period=MAX_PERIOD):
+
+    codes = {}
+    results = []
+
+    for cells in patterns:
+
+        k = normalised_fingerprint(cells)
+
+        if k not in codes:
+            period, phases = find_phases(cells, max_period)
+            codes[k] = None if period is None else canonise_phases(period, phases)
+
+        results.append(codes[k])
+
+    return results
@@ -2,20 +2,33 @@
 # Changes from 1.0:
 #   added auto-creation of InfectLife.rule when necessary
 
-import golly as g
+import hashlib
+import heapq
+import multiprocessing
 import os
+import sys
 from os import listdir
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from apgcode import encode_cells
+from cellset import CellSet, coords, key
+from edges import edge_to_string
+from fingerprint import fingerprint
+from object_store import get_store
+from tiles import TILE_MARGIN, TILE_SIZE, rle_region_cells, rle_tiles
+
+try:
+    import golly as g
+except ImportError:
+    # Not running inside Golly
+    import lifesim as g
+
 SUCCESS = 0
 FAIL = 1
 UNKNOWN = 2
 
-try:
-  oldrule = g.setrule("InfectLife")
-  g.setrule(oldrule)
-except:
-  with open(os.path.join(g.getdir("rules"), "InfectLife.rule"),"w" ) as f:
-    f.write("""@RULE InfectLife
+INFECT_LIFE = """@RULE InfectLife
 
 @TABLE
 
@@ -39,7 +52,27 @@ var c = {1,2}
 var d = {3,4}
 
 c,d,a1,a2,a3,a4,a5,a6,a7,3
-0,3,b1,b2,a3,a4,a5,a6,a7,4""")
+0,3,b1,b2,a3,a4,a5,a6,a7,4"""
+
+infect_life_installed = False
+
+# Make sure Golly has the InfectLife rule, writing the rule file the first
+# time it is needed if Golly doesn't know it
+def install_infect_life():
+
+    global infect_life_installed
+
+    if infect_life_installed:
+        return
+
+    try:
+        oldrule = g.setrule("InfectLife")
+        g.setrule(oldrule)
+    except:
+        with open(os.path.join(g.getdir("rules"), "InfectLife.rule"), "w") as f:
+            f.write(INFECT_LIFE)
+
+    infect_life_installed = True
 
 # Shortcut to place cells in a new rule
 def putcells(rule, cells):
@@ -90,9 +123,18 @@ def canonise(duration):
             # Fits within a 40-by-40 bounding box, so eligible to be canonised.
             # Choose the orientation which results in the smallest description:
 
+            pairs = to_pairs(g.getcells(rect))
+
             for args in rect_to_args_list(rect):
 
-                next_rep = canonise_orientation(*args)
+                _, breadth, ox, oy, a, b, c, d = args
+
+                # None if it can't beat or tie the best so far
+                next_rep = encode_cells(pairs, breadth, ox, oy, a, b, c, d,
+                                        representation)
+
+                if next_rep is None:
+                    continue
 
                 if next_rep == representation:
                     # If match is later than previous matches reset list, otherwise append.
@@ -103,12 +145,10 @@ def canonise(duration):
                         transforms.append(args)
                 else:
                     
-                    representation = compare_representations(representation, next_rep)
-                    
                     # New best representation so reset the list
-                    if next_rep == representation:
-                        latest = t
-                        transforms = [args]
+                    representation = next_rep
+                    latest = t
+                    transforms = [args]
 
         g.run(1)
 
@@ -118,58 +158,8 @@ def canonise(duration):
 
     return representation, latest, transforms
 
-# A subroutine used by canonise:
-def canonise_orientation(length, breadth, ox, oy, a, b, c, d):
-
-    representation = ""
-
-    chars = "0123456789abcdefghijklmnopqrstuvwxyz"
-
-    for v in xrange(int((breadth-1)/5)+1):
-        zeroes = 0
-        if (v != 0):
-            representation += "z"
-        for u in xrange(length):
-            baudot = 0
-            for w in xrange(5):
-                x = ox + a*u + b*(5*v + w)
-                y = oy + c*u + d*(5*v + w)
-                baudot = (baudot >> 1) + 16*g.getcell(x, y)
-            if (baudot == 0):
-                zeroes += 1
-            else:
-                if (zeroes > 0):
-                    if (zeroes == 1):
-                        representation += "0"
-                    elif (zeroes == 2):
-                        representation += "w"
-                    elif (zeroes == 3):
-                        representation += "x"
-                    else:
-                        representation += "y"
-                        representation += chars[zeroes - 4]
-                zeroes = 0
-                representation += chars[baudot]
-    return representation
-
-# Compares strings first by length, then by lexicographical ordering.
-# A hash character is worse than anything else.
-def compare_representations(a, b):
-
-    if (a == "#"):
-        return b
-    elif (b == "#"):
-        return a
-    elif (len(a) < len(b)):
-        return a
-    elif (len(b) < len(a)):
-        return b
-    elif (a < b):
-        return a
-    else:
-        return b
-
-# Find the period and maximum dimensions of an object
+# Find the period and maximum dimensions of an object. Every shape seen is
+# remembered in the object store, so each is only simulated once.
 def analyse_object(max_period):
     
     rect = g.getrect()
@@ -177,28 +167,7 @@ def analyse_object(max_period):
     if not rect:
         return 1, None
 
-    cells = to_pairs(g.getcells(rect))
-
-    dimensions = [rect[0], rect[1], rect[0] + rect[2] - 1, rect[1] + rect[3] - 1]
-
-    for t in range(max_period):
-        
-        g.run(1)
-
-        if int(g.getpop()) == len(cells) and all(g.getcell(x, y) for x, y in cells):
-            return t + 1, dimensions
-
-        rect = g.getrect()
-
-        if not rect:
-            return None, None
-        
-        dimensions[0] = min(dimensions[0], rect[0])
-        dimensions[1] = min(dimensions[1], rect[1])
-        dimensions[2] = max(dimensions[2], rect[0] + rect[2] - 1)
-        dimensions[3] = max(dimensions[3], rect[1] + rect[3] - 1)
- 
-    return None, None
+    return get_store().analyse(g.getcells(rect), max_period)
 
 
 # Convert cell list to pairs
@@ -221,16 +190,18 @@ def boundary(pairs):
 
     return list(s - set(pairs))
 
-GLIDERS = [(g.parse("3o$2bo$bo!", -2, 0), 1, -1),   #NE
-           (g.parse("bo$2bo$3o!", -2, -2), 1, 1),   #SE
-           (g.parse("bo$o$3o!", 0, -2), -1, 1),     #SW
-           (g.parse("3o$o$bo!", 0, 0), -1, -1)]     #NW
+# The canonical glider of each direction with its velocity. The cell lists
+# are what g.parse gives for the RLE in the comment, written out so that
+# importing this module doesn't need Golly.
+GLIDERS = [([-2, 0, -1, 0, 0, 0, 0, 1, -1, 2], 1, -1),    #NE 3o$2bo$bo! at -2, 0
+           ([-1, -2, 0, -1, -2, 0, -1, 0, 0, 0], 1, 1),   #SE bo$2bo$3o! at -2, -2
+           ([1, -2, 0, -1, 0, 0, 1, 0, 2, 0], -1, 1),     #SW bo$o$3o! at 0, -2
+           ([0, 0, 1, 0, 2, 0, 0, 1, 1, 2], -1, -1)]      #NW 3o$o$bo! at 0, 0
 
 # Remove gliders from the pattern and return all timing information
 def remove_gliders():
 
     cells = g.getcells(g.getrect())
-    cells = zip(cells[::2], cells[1::2])
 
     lists = []
 
@@ -243,7 +214,9 @@ def remove_gliders():
             wanted = to_pairs(glider)
             unwanted = boundary(wanted)
 
-            for x, y in cells:
+            for i in range(0, len(cells), 2):
+
+                x, y = cells[i], cells[i+1]
 
                 if not all(g.getcell(x+dx, y+dy) for dx, dy in wanted):
                     continue
@@ -329,6 +302,159 @@ def canonical_time2(glider_lists):
         return 0
 
 
+GLIDER_PHASES = None
+
+# Cells of each glider in each of its four phases, worked out on first use
+def glider_phases():
+
+    global GLIDER_PHASES
+
+    if GLIDER_PHASES is None:
+        GLIDER_PHASES = [[to_pairs(g.evolve(glider, phase)) for phase in range(4)]
+                         for glider, _, _ in GLIDERS]
+
+    return GLIDER_PHASES
+
+# Cells of a single glider where it would be at time t
+def glider_cells(direction, lane, timing, t):
+
+    _, vx, vy = GLIDERS[direction]
+
+    phase = (t + timing) % 4
+    x = lane + (t + timing - phase) // 4 * vx
+    y = (t + timing - phase) // 4 * vy
+
+    return [(x + dx, y + dy) for dx, dy in glider_phases()[direction][phase]]
+
+# Run a small set of (x, y) pairs for one generation
+def step_pairs(cells):
+
+    counts = {}
+
+    for x, y in cells:
+        for dx in [-1, 0, 1]:
+            for dy in [-1, 0, 1]:
+                if dx or dy:
+                    counts[(x+dx, y+dy)] = counts.get((x+dx, y+dy), 0) + 1
+
+    return set(c for c, n in counts.items()
+               if n == 3 or (n == 2 and c in cells))
+
+# Gliders whose paths come within this distance of each other could
+# possibly affect each other during the spacing check. Anything further
+# apart can't, even counting debris spreading at the speed of light.
+SPACING_MARGIN = 8
+
+# Set to True to check well_spaced against the original simulation
+CHECK_SPACING_BY_SIMULATION = False
+
+# Check the glider salvos are well spaced, ie. gliders placed where they
+# would be at time t - 4 and run for 4 generations turn into exactly the
+# gliders at time t. This is worked out from the glider lists alone:
+#
+# The gliders are sorted by the bounding box of their path from t - 4 to
+# t and a sweep over x groups together any whose boxes come within
+# SPACING_MARGIN of each other. A glider on its own is fine. Only the
+# cells of each group of close gliders are run for 4 generations.
+#
+# The boxes still in reach of the sweep are kept in a heap by the x where
+# they drop out of reach, and in buckets by y of the height of a box plus
+# the margin, so each glider is only compared with the boxes in its own
+# and the two neighbouring buckets.
+def well_spaced(glider_lists, t):
+
+    paths = []
+
+    for direction, glider_list in enumerate(glider_lists):
+        for lane, timing in glider_list:
+
+            cells = []
+            for s in range(t - 4, t + 1):
+                cells += glider_cells(direction, lane, timing, s)
+
+            xs = [x for x, _ in cells]
+            ys = [y for _, y in cells]
+
+            paths.append((min(xs), max(xs), min(ys), max(ys),
+                          direction, lane, timing))
+
+    paths.sort()
+
+    # Union-find over the gliders
+    parent = list(range(len(paths)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Boxes close enough in y are in the same or a neighbouring bucket
+    reach = SPACING_MARGIN + max([path[3] - path[2] + 1 for path in paths] +
+                                 [1])
+
+    expiry = []
+    buckets = {}
+
+    for i, (min_x, max_x, min_y, max_y, _, _, _) in enumerate(paths):
+
+        while expiry and expiry[0][0] < min_x:
+            _, j = heapq.heappop(expiry)
+            buckets[paths[j][2] // reach].remove(j)
+
+        bucket = min_y // reach
+
+        for b in (bucket - 1, bucket, bucket + 1):
+            for j in buckets.get(b, ()):
+                if (paths[j][2] - SPACING_MARGIN <= max_y and
+                    min_y <= paths[j][3] + SPACING_MARGIN):
+                    parent[root(j)] = root(i)
+
+        heapq.heappush(expiry, (max_x + SPACING_MARGIN, i))
+        buckets.setdefault(bucket, set()).add(i)
+
+    groups = {}
+
+    for i, path in enumerate(paths):
+        groups.setdefault(root(i), []).append(path[4:])
+
+    for group in groups.values():
+
+        if len(group) == 1:
+            continue
+
+        cells = set()
+        for direction, lane, timing in group:
+            cells.update(glider_cells(direction, lane, timing, t - 4))
+
+        for _ in range(4):
+            cells = step_pairs(cells)
+
+        if len(cells) != 5 * len(group):
+            return False
+
+        for direction, lane, timing in group:
+            if not cells.issuperset(glider_cells(direction, lane, timing, t)):
+                return False
+
+    return True
+
+# The original spacing check, done by running the salvo in the universe
+def well_spaced_by_simulation(glider_lists, t):
+
+    g.new('')
+
+    place_gliders(glider_lists, t - 4)
+    g.run(4)
+    pop = int(g.getpop())
+
+    if pop != 5 * sum(len(glider_list) for glider_list in glider_lists):
+        return False
+
+    place_gliders(glider_lists, t)
+
+    return pop == int(g.getpop())
+
 # Place gliders into the pattern where they would be at time t
 def place_gliders(glider_lists, t):
 
@@ -387,6 +513,7 @@ def canonise_synthesis():
 
     canonical_cells = g.getcells(g.getrect())
 
+    # Compare the canonical pattern with the original at the same time
     if canonical_t < 0:
         g.run(-canonical_t)
         g.putcells(start_cells, 0, 0, 1, 0, 0, 1, "xor")
@@ -397,16 +524,12 @@ def canonise_synthesis():
         return FAIL, start_cells
 
     # Check glider salvos are well spaced
-    place_gliders(glider_lists, canonical_t - 4)
-    g.run(4)
-    pop = int(g.getpop())
-
-    if pop != 5 * sum(len(glider_list) for glider_list in glider_lists):
-        return FAIL, start_cells
+    spaced = well_spaced(glider_lists, canonical_t)
 
-    place_gliders(glider_lists, canonical_t)
+    if CHECK_SPACING_BY_SIMULATION:
+        assert spaced == well_spaced_by_simulation(glider_lists, canonical_t)
 
-    if pop != int(g.getpop()):
+    if not spaced:
         return FAIL, start_cells
 
     best_gliders = None
@@ -461,59 +584,19 @@ def canonise_synthesis():
 
     return SUCCESS, edge
 
-chars = "0123456789abcdefghijklmnopqrstuvwxyz"
-
-# Based on code by Arie Paap Sept. 2014
-def decodeCanon(canonPatt):
-
-    if not canonPatt or canonPatt[0] != 'x' or '_' not in canonPatt:
-        return []
-    
-    blank = False
-    x = y = 0
-    clist = []
-    
-    for c in canonPatt[canonPatt.find("_")+1:]:
-   
-        if blank:
-            if c == "z":
-                x += 35
-            else:
-                x += chars.index(c)
-                blank = False
-        else:
-            if (c == 'y'):
-                x += 4
-                blank = True
-            elif (c == 'x'):
-                x += 3
-            elif (c == 'w'):
-                x += 2
-            elif (c == 'z'):
-                x = 0
-                y += 5
-            else:
-                v = chars.index(c)
-                for i in range(5):
-                    if v & (1 << i):
-                        clist += [x, y+i]
-                x += 1
-
-    return clist
-
-
 def display_edge(edge, delay=False):
 
     g.new('')
     
     input_code, output_code, phase, glider_lists, transform = edge
 
-    input_cells = decodeCanon(input_code)
+    store = get_store()
+
+    input_cells = store.phase_cells(input_code)
 
     g.putcells(input_cells)
     
-    output_cells = decodeCanon(output_code)
-    output_cells = g.evolve(output_cells, phase)
+    output_cells = store.phase_cells(output_code, phase)
     output_cells = g.transform(output_cells, *transform)
     
     g.putcells(output_cells, 100, 0)
@@ -530,28 +613,85 @@ def display_edge(edge, delay=False):
         pass
 
 
-# Find all occurences of cells1 in cells2 and append all matches to results
-def find(results, cells1, cells2):
-    
-    if not cells1 or not cells2:
-        return
+# Offsets of the 3-by-3 neighbourhood, as cell keys (see cellset.py), and
+# the bit each one has in a neighbourhood signature
+SIGNATURE_BITS = [(key(dx, dy), 1 << i) for i, (dx, dy) in
+                  enumerate((dx, dy) for dy in [-1, 0, 1] for dx in [-1, 0, 1])]
+
+# Signature of the 3-by-3 neighbourhood of the cell with key k in a set of
+# keys
+def signature(keys, k):
+    return sum(bit for d, bit in SIGNATURE_BITS if k + d in keys)
 
-    wanted = to_pairs_and_shift(cells1)
-    unwanted = boundary(wanted)
+# An index of a pattern for finding many small patterns in it.
+#
+# A match needs every template cell to be on and every cell around the
+# template to be off, so each template cell's 3-by-3 neighbourhood in the
+# pattern is known exactly. The pattern's cells are indexed by their
+# neighbourhood signature, and a query only tries the cells whose
+# signature matches the rarest signature in the template.
+#
+# Cells are held as keys, so indexing a whole pattern doesn't make a
+# tuple for every cell.
+class PatternIndex(object):
 
-    putcells("Life", cells2)
+    def __init__(self, cells):
 
-    for i in range(0, len(cells2), 2):
+        key_list = CellSet(cells).key_list()
+        self.cells = set(key_list)
 
-        x, y = cells2[i], cells2[i+1]
+        # Position of each cell in the original list, so that matches come
+        # out in the same order as a scan of the list would give
+        self.order = {}
+        self.by_signature = {}
 
-        if not all(g.getcell(x+dx, y+dy) for dx, dy in wanted):
-            continue
+        for i, k in enumerate(key_list):
+            self.order[k] = i
+            self.by_signature.setdefault(signature(self.cells, k), []).append(k)
 
-        if any(g.getcell(x+dx, y+dy) for dx, dy in unwanted):
-            continue
+    # Find all occurences of cells1 in the pattern and append all matches
+    # to results
+    def find(self, results, cells1):
+
+        if not cells1 or not self.cells:
+            return
+
+        wanted = to_pairs_and_shift(cells1)
+        wanted_keys = [key(dx, dy) for dx, dy in wanted]
+        unwanted_keys = [key(dx, dy) for dx, dy in boundary(wanted)]
+        template = set(wanted_keys)
+
+        # Anchor on the template cell with the fewest candidates
+        anchor = min(wanted_keys, key=lambda d: len(
+            self.by_signature.get(signature(template, d), [])))
+
+        candidates = self.by_signature.get(signature(template, anchor), [])
+
+        matches = []
+
+        for c in candidates:
+
+            k = c - anchor
 
-        results.append([(x+dx, y+dy) for dx, dy in wanted])
+            if not all(k + d in self.cells for d in wanted_keys):
+                continue
+
+            if any(k + d in self.cells for d in unwanted_keys):
+                continue
+
+            matches.append((self.order[k], k))
+
+        matches.sort()
+
+        for _, k in matches:
+            x, y = coords(k)
+            results.append([(x+dx, y+dy) for dx, dy in wanted])
+
+
+# Find all occurences of cells1 in cells2 and append all matches to results
+def find(results, cells1, cells2):
+
+    PatternIndex(cells2).find(results, cells1)
 
 
 # Spread an infection then remove it and return it
@@ -560,36 +700,99 @@ def infect_and_remove(germ):
     for x, y in germ:
         g.setcell(x, y, 3)
 
+    install_infect_life()
     g.setrule("InfectLife")
     g.setbase(2)
     g.setstep(10)
     g.step()
 
-    chunk = []
+    chunk = CellSet()
     cells = g.getcells(g.getrect())
     for i in range(0, len(cells)-2, 3):
         if cells[i+2] >= 3:
             g.setcell(cells[i], cells[i+1], 0)
-            chunk.append((cells[i], cells[i+1]))
+            chunk.cells.append(cells[i])
+            chunk.cells.append(cells[i+1])
 
     return chunk
 
 
-# Return ON cells that are a subset of the given pairs
-def get_subset(pairs):
+# Return ON cells that are a subset of the given CellSet
+def get_subset(chunk):
     
     cells = []
+    chunk = chunk.cells
 
-    for x, y in pairs:
-        if g.getcell(x, y):
-            cells.append(x)
-            cells.append(y)
+    for i in range(0, len(chunk), 2):
+        if g.getcell(chunk[i], chunk[i+1]):
+            cells.append(chunk[i])
+            cells.append(chunk[i+1])
 
     return cells
 
+# Indexes of the full pattern at generations 0 and 840, used by
+# analyse_chunk. get_syntheses sets them once per call with set_patterns.
+patterns = None
+
+def set_patterns(start_cells, end_cells):
+    global patterns
+    patterns = PatternIndex(start_cells), PatternIndex(end_cells)
+
+# Initializer of the worker processes. A forked worker already has the
+# indexes get_syntheses built, only one started afresh (as on Windows)
+# has to build them.
+def init_worker(start_cells, end_cells):
+    if patterns is None:
+        set_patterns(start_cells, end_cells)
+
+# Check whether a chunk of the pattern contains gliders. If it does, return
+# germs for the chunks it interacts with: matches of the chunk in the full
+# pattern at generation 840 and matches of the chunk's own generation 840
+# in the full pattern. Return None if there are no gliders.
+#
+# This only uses the universe for scratch work, so chunks can be analysed
+# in any order and in separate processes.
+def analyse_chunk(input_cells):
+
+    start_index, end_index = patterns
+
+    output_cells = g.evolve(input_cells, 840)
+    putcells("Life", input_cells)
+
+    if not any(remove_gliders()):
+        return None
+
+    input_cells = g.getcells(g.getrect())
+
+    # Search for the input of the current chunk in the output of
+    # the full pattern and then search for the output of the
+    # current chunk in the full pattern.
+    germs = []
+    end_index.find(germs, input_cells)
+    start_index.find(germs, output_cells)
+
+    return germs
+
+# Number of processes used to analyse chunks. Inside Golly there is only
+# the one universe so the chunks are done one at a time; without Golly
+# (running on lifesim) every core gets used.
+WORKERS = 1 if g.__name__ == "golly" else multiprocessing.cpu_count()
+
+# Analyse a batch of chunks, returning results in the same order. pool is
+# a process pool whose workers have the patterns set, or None to analyse
+# the chunks here with the patterns set in this process.
+def analyse_chunks(batch, pool):
+
+    if pool is None or len(batch) <= 1:
+        return [analyse_chunk(input_cells) for input_cells in batch]
+
+    return pool.map(analyse_chunk, batch, 1)
+
 # Generates what it thinks are all the relevant glider syntheses in the
 # current pattern
-def get_syntheses():
+def get_syntheses(workers=WORKERS):
+
+    install_infect_life()
 
     g.setrule("Life")
     start_cells = g.getcells(g.getrect())
@@ -614,90 +817,355 @@ def get_syntheses():
         
     putcells("Life", start_cells)
         
-    synths = []
     inputs = []
     
     for chunk in chunks:
         inputs.append(get_subset(chunk))
         
     end_cells = g.evolve(start_cells, 840)
-    
+
+    # The patterns are indexed once here and reused for every batch
+    set_patterns(start_cells, end_cells)
+
+    # One pool serves every batch, so the processes are started and sent
+    # the patterns once per call rather than once per batch
+    pool = None
+    if workers > 1 and len(inputs) > 1:
+        pool = multiprocessing.Pool(workers, init_worker,
+                                    (start_cells, end_cells))
+
+    try:
+        return find_syntheses(inputs, start_cells, history_cells, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+# The worklist of get_syntheses, processed a batch at a time. Every new
+# chunk on the list is analysed (in parallel if there is a pool), then the
+# germs they produce are infected to give the next batch.
+def find_syntheses(inputs, start_cells, history_cells, pool):
+
+    synths = []
     seen = set()
 
     while inputs:
-        
-        input_cells = inputs.pop()
-        
-        hashable = tuple(sorted(to_pairs(input_cells)))
-        if hashable in seen:
-            continue
-        
-        seen.add(hashable)
 
-        output_cells = g.evolve(input_cells, 840)
-        putcells("Life", input_cells)
+        batch = []
 
-        if not any(remove_gliders()):
-            continue
+        while inputs:
 
-        # The current chunk contains gliders so add it to the list
-        synths.append(input_cells)
-        
-        input_cells = g.getcells(g.getrect())
+            input_cells = inputs.pop()
+
+            # Chunks are only the same if they are in the same place, so
+            # this is the position dependent fingerprint
+            hashable = fingerprint(input_cells)
+            if hashable in seen:
+                continue
 
-        # Search for the input of the current chunk in the output of
-        # the full pattern and then search for the output of the
-        # current chunk in the full pattern.
-        germs = []
-        find(germs, input_cells, end_cells)
-        find(germs, output_cells, start_cells)
+            seen.add(hashable)
+            batch.append(input_cells)
 
-        for germ in germs:
+        results = analyse_chunks(batch, pool)
 
-            putcells("InfectLife", history_cells)
-            chunk = infect_and_remove(germ)
-            putcells("Life", start_cells)
-            inputs.append(get_subset(chunk))
+        for input_cells, germs in zip(batch, results):
+
+            if germs is None:
+                continue
+
+            # The current chunk contains gliders so add it to the list
+            synths.append(input_cells)
+
+            for germ in germs:
+
+                putcells("InfectLife", history_cells)
+                chunk = infect_and_remove(germ)
+                putcells("Life", start_cells)
+                inputs.append(get_subset(chunk))
 
     return synths
 
 
-count = 0
+# Files bigger than this are read a tile at a time (see tiles.py) rather
+# than loaded whole
+TILED_FILE_SIZE = 1 << 20
+
+# Generations of history get_syntheses runs (setbase(2), setstep(10))
+HISTORY_GENERATIONS = 1 << 10
+
+# A synthesis with cells this close to the edge of the region read for its
+# tile may not have been seen whole. In HISTORY_GENERATIONS a glider
+# travels 256 cells, and a glider from the synthesis and one from outside
+# the region can both travel that far to meet, so anything closer than
+# twice that (and a few cells for the infection to cross) is done again.
+# Tile margins have to be at least this wide.
+TILE_GUARD = 2 * (HISTORY_GENERATIONS // 4) + 8
+
+# How many times the margin is doubled for syntheses that cross the edge
+# of their tile's region before they are taken as they are
+STITCH_ROUNDS = 3
+
+# The cell of a synthesis that decides which tile it belongs to: the first
+# one in the order of an RLE file
+def synthesis_owner(cells):
+    return min(zip(cells[1::2], cells[::2]))[::-1]
+
+def synthesis_box(cells):
+    return (min(cells[::2]), min(cells[1::2]),
+            max(cells[::2]) + 1, max(cells[1::2]) + 1)
+
+def near_edge(box, region):
+    return (box[0] < region[0] + TILE_GUARD or box[1] < region[1] + TILE_GUARD or
+            box[2] > region[2] - TILE_GUARD or box[3] > region[3] - TILE_GUARD)
+
+def expand(rect, margin):
+    return (rect[0] - margin, rect[1] - margin, rect[2] + margin, rect[3] + margin)
+
+# Whether the tile pass of get_syntheses_tiled keeps a synthesis: its
+# first cell is in a tile and it isn't near the edge of that tile's region
+def tile_keeps(cells, size, margin):
+
+    x, y = synthesis_owner(cells)
+    core = (x - x % size, y - y % size, x - x % size + size, y - y % size + size)
+
+    return not near_edge(synthesis_box(cells), expand(core, margin))
+
+# A function giving the index of the first of a list of boxes that a
+# synthesis has a cell in, or None
+def first_box(boxes, size):
+
+    # Boxes by the size by size squares they touch
+    squares = {}
+    for i, box in enumerate(boxes):
+        for sx in range(box[0] // size, (box[2] - 1) // size + 1):
+            for sy in range(box[1] // size, (box[3] - 1) // size + 1):
+                squares.setdefault((sx, sy), []).append(i)
+
+    def first(cells):
+
+        found = None
+
+        for j in range(0, len(cells), 2):
+            x, y = cells[j], cells[j+1]
+            for i in squares.get((x // size, y // size), ()):
+                box = boxes[i]
+                if ((found is None or i < found) and box[0] <= x < box[2] and
+                    box[1] <= y < box[3]):
+                    found = i
+
+        return found
+
+    return first
+
+# Same as opening an RLE file and calling get_syntheses, but reading the
+# file a tile at a time so that only the cells near one tile are ever in
+# the universe. Each tile gives the syntheses that start inside it, as
+# soon as the tile has been done. Those within TILE_GUARD of the edge of
+# the region read for the tile could have met something outside it, so
+# they are done again afterwards, in a bigger region around each of them.
+#
+# Nothing is kept for the syntheses already given but the boxes of those
+# still to be done again. A synthesis found again in a bigger region is
+# only taken if the tile pass wouldn't have kept it, and only from the
+# region of the first box (in sorted order) that it overlaps, so none is
+# given twice.
+def get_syntheses_tiled(filename, size=TILE_SIZE, margin=TILE_MARGIN,
+                        workers=WORKERS):
+
+    if margin < TILE_GUARD:
+        raise ValueError("tile margin must be at least %d" % TILE_GUARD)
+
+    crossing = set()
+
+    for core, cells in rle_tiles(filename, size, margin):
+
+        putcells("Life", cells)
+        region = expand(core, margin)
+
+        for synth in get_syntheses(workers):
+
+            x, y = synthesis_owner(synth)
+
+            if not (core[0] <= x < core[2] and core[1] <= y < core[3]):
+                continue
+
+            if near_edge(synthesis_box(synth), region):
+                crossing.add(synthesis_box(synth))
+                continue
+
+            yield synth
+
+    tile_margin = margin
+
+    for stitch_round in range(STITCH_ROUNDS + 1):
+
+        if not crossing:
+            break
+
+        margin = max(2 * margin, 2 * TILE_GUARD)
+        boxes = sorted(crossing)
+        crossing = set()
+        regions = [expand(box, margin) for box in boxes]
+        first = first_box(boxes, size)
+
+        for i, cells in rle_region_cells(filename, regions):
+
+            putcells("Life", cells)
+
+            for synth in get_syntheses(workers):
+
+                # Anything that overlaps the crossing synthesis, which may
+                # turn out to be bigger or to start somewhere else
+                if first(synth) != i or tile_keeps(synth, size, tile_margin):
+                    continue
+
+                if (near_edge(synthesis_box(synth), regions[i]) and
+                    stitch_round < STITCH_ROUNDS):
+                    crossing.add(synthesis_box(synth))
+                    continue
+
+                yield synth
+
+# The bulk run below records its progress in JOURNAL and appends the
+# canonical edges it finds to RESULTS, so that an interrupted run can be
+# resumed. Each journal line is one of
+#
+#   start <sha1> <filename>
+#   done <sha1> <results length> <successes> <failures> <filename>
+#
+# Files are identified by the hash of their contents so a file that is
+# edited after it was processed will be processed again.
+JOURNAL = "journal.txt"
+RESULTS = "edges.txt"
+
+def file_hash(filename):
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Read the journal. Returns the status of every file seen so far and the
+# length of RESULTS as of the last completed file.
+def read_journal():
+
+    status = {}
+    committed = 0
+
+    if not os.path.exists(JOURNAL):
+        return status, committed
+
+    with open(JOURNAL) as f:
+        for line in f:
 
-for filename in listdir("synths"):
+            # A line torn by a crash is ignored
+            if not line.endswith("\n"):
+                break
+
+            fields = line.split(None, 5)
+
+            if fields[0] == "start" and len(fields) == 3:
+                status.setdefault(fields[1], "incomplete")
+            elif fields[0] == "done" and len(fields) == 6:
+                status[fields[1]] = "done"
+                committed = int(fields[2])
+
+    return status, committed
+
+# Append to an open file and make sure it has reached the disk
+def append_durably(f, s):
+    f.write(s)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# Canonicalise every synthesis in one file. Returns the edge lines found
+# and the number of failures, which are saved in the errors directory
+# under names ending in name.
+def canonise_file(path, name, errors="errors"):
 
     err_count = 0
+    lines = []
 
-    g.open("synths/" + filename)
-    pats = get_syntheses()
+    if (path.lower().endswith(".rle") and
+        os.path.getsize(path) > TILED_FILE_SIZE):
 
-    offset = 0
-    g.new('')
-    g.setrule("Life")
-    for pat in pats:
-        g.putcells(pat, offset-min(pat[::2]), -min(pat[1::2]))
-        offset += 100
-    g.fit()
-    g.update()
+        # Each synthesis is canonised as soon as its tile gives it, so no
+        # more than a tile's worth is ever held
+        pats = get_syntheses_tiled(path)
+
+    else:
+        g.open(path)
+        pats = get_syntheses()
+
+        # Show them all side by side
+        offset = 0
+        g.new('')
+        g.setrule("Life")
+        for pat in pats:
+            g.putcells(pat, offset-min(pat[::2]), -min(pat[1::2]))
+            offset += 100
+        g.fit()
+        g.update()
 
     for pat in pats:
 
         putcells("Life", pat)
-        status, result = canonise_synthesis()
+        result_status, result = canonise_synthesis()
 
-        if status == SUCCESS:
+        if result_status == SUCCESS:
 
             #display_edge(result)
-            pass
+            lines.append(edge_to_string(result) + "\n")
 
         else: 
 
-            prefix = "fail" if status == FAIL else "unknown"
+            prefix = "fail" if result_status == FAIL else "unknown"
 
             g.new('')
             g.putcells(result)
-            g.save("errors/%s%d_%s" % (prefix, err_count, filename), "rle")
+            g.save("%s/%s%d_%s" % (errors, prefix, err_count, name), "rle")
             err_count += 1
-        
-    count += 1
-    g.show(str(count))
+
+    return lines, err_count
+
+# Canonicalise every synthesis in every file in synths/, appending the
+# edges to edges.txt and recording progress in journal.txt
+def main():
+
+    status, committed = read_journal()
+
+    # Throw away any edges written for a file that was not completed
+    results = open(RESULTS, "a")
+    results.truncate(committed)
+    results.seek(0, 2)
+
+    journal = open(JOURNAL, "a")
+
+    count = 0
+
+    for filename in listdir("synths"):
+
+        digest = file_hash("synths/" + filename)
+
+        if status.get(digest) == "done":
+            count += 1
+            continue
+
+        append_durably(journal, "start %s %s\n" % (digest, filename))
+        status[digest] = "incomplete"
+
+        lines, err_count = canonise_file("synths/" + filename, filename)
+
+        # The edges for the whole file go in with a single write, followed
+        # by the journal entry that commits them.
+        append_durably(results, "".join(lines))
+        append_durably(journal, "done %s %d %d %d %s\n" % (
+            digest, results.tell(), len(lines), err_count, filename))
+        status[digest] = "done"
+
+        count += 1
+        g.show(str(count))
+
+    results.close()
+    journal.close()
+
+if __name__ == "__main__":
+    main()
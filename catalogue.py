@@ -0,0 +1,229 @@
+# catalogue.py
+#
+# Write the synthesis of every object in min_paths.txt as RLE, with its
+# cost, in one pass over the tree of edges.
+#
+# Each synthesis is drawn as display_synth.py draws it: one row of the
+# picture per edge, the input and gliders on the left and the result 100
+# cells to the right, with the target in its canonical orientation in the
+# last row. Since every object has one edge, the edges form a tree rooted
+# at "0", and the chains of all the objects below an edge share that
+# edge's row up to a reflection or rotation. So the tree is walked depth
+# first from "0", composing the transforms on the way down, and each
+# edge's cells are decoded, evolved and transformed once, and turned into
+# RLE rows once per orientation they are needed in. Writing a target
+# still joins the rows of its whole chain, in the target's orientation, so
+# that part takes time in proportion to the chain length, as does the
+# RLE it writes.
+#
+# Usage:
+#   python catalogue.py [--out catalogue.txt] [EDGE_FILE]
+#
+# The edge file defaults to min_paths.txt. Objects whose chain doesn't
+# lead back to "0" are left out.
+
+from __future__ import print_function
+
+import sys
+import time
+
+from cellset import CellSet
+from edges import compose, edge_cost, inverse, read_min_paths
+from lifesim import transform
+from object_store import get_store
+from verify_paths import glider_keys
+
+CATALOGUE = "catalogue.txt"
+
+IDENTITY = (0, 0, 1, 0, 0, 1)
+
+# Rows of the picture are this far apart, and the result of each edge
+# this far to the right of its input
+SPACING = 100
+
+def run_length(n, symbol):
+    return "%d%s" % (n, symbol) if n > 1 else symbol
+
+# The RLE of one row of cells, given as a sorted list of x coordinates,
+# as a list of runs starting at the first cell
+def row_tokens(xs):
+
+    out = []
+    run_start = x = xs[0]
+
+    for i, cx in enumerate(xs):
+
+        if i + 1 < len(xs) and xs[i+1] == cx + 1:
+            continue
+
+        if run_start > x:
+            out.append(run_length(run_start - x, "b"))
+        out.append(run_length(cx - run_start + 1, "o"))
+
+        x = cx + 1
+        if i + 1 < len(xs):
+            run_start = xs[i+1]
+
+    return out
+
+def row_rle(xs):
+    return "".join(row_tokens(xs))
+
+# A flat cell list as a list of (y, xs, rle) rows, top to bottom
+def cells_to_rows(cells):
+
+    rows = {}
+    for i in range(0, len(cells), 2):
+        rows.setdefault(cells[i+1], set()).add(cells[i])
+
+    result = []
+    for y in sorted(rows):
+        xs = sorted(rows[y])
+        result.append((y, xs, row_rle(xs)))
+
+    return result
+
+# An edge in the tree, with the transform from its input's frame to the
+# frame of the edges from "0", and its row of the picture in each
+# orientation it has been drawn in so far
+class Node(object):
+
+    def __init__(self, edge, frame, cost):
+
+        input_code, output_code, phase, glider_lists, t = edge
+
+        self.edge = edge
+        self.frame = frame
+        self.cost = cost
+
+        store = get_store()
+
+        gliders = CellSet.from_keys(sorted(glider_keys(glider_lists)))
+        self.input_cells = store.phase_cells(input_code) + gliders.tolist()
+
+        self.output_cells = transform(store.phase_cells(output_code, phase), *t)
+        self.rows = {}
+
+    # The edge's rows with the matrix m applied
+    def oriented_rows(self, m):
+
+        if m not in self.rows:
+            self.rows[m] = cells_to_rows(
+                transform(self.input_cells, 0, 0, *m) +
+                transform(self.output_cells, SPACING, 0, *m))
+
+        return self.rows[m]
+
+# The RLE of the synthesis given by a path of nodes from "0"
+def path_rle(path):
+
+    target = path[-1]
+    view = inverse(compose(target.edge[4], target.frame))
+
+    rows = {}
+
+    for depth, node in enumerate(path):
+        t = compose(node.frame, view)
+        x0, y0 = t[0], t[1] + depth * SPACING
+        for y, xs, rle in node.oriented_rows(tuple(t[2:])):
+            rows.setdefault(y + y0, []).append((xs, rle, x0))
+
+    if not rows:
+        return "x = 0, y = 0, rule = B3/S23\n!"
+
+    min_x = min(xs[0] + x0 for row in rows.values() for xs, _, x0 in row)
+    max_x = max(xs[-1] + x0 for row in rows.values() for xs, _, x0 in row)
+    min_y = min(rows)
+    max_y = max(rows)
+
+    out = []
+    last_y = min_y
+
+    for y in sorted(rows):
+
+        row = rows[y]
+
+        if len(row) == 1:
+            xs, rle, x0 = row[0]
+            first = xs[0] + x0
+        else:
+            # Rows of different edges overlap here
+            xs = sorted(set(x + x0 for xs, _, x0 in row for x in xs))
+            first = xs[0]
+            rle = row_rle(xs)
+
+        if y > last_y:
+            out.append(run_length(y - last_y, "$"))
+        if first > min_x:
+            out.append(run_length(first - min_x, "b"))
+        out.append(rle)
+
+        last_y = y
+
+    out.append("!")
+
+    return "x = %d, y = %d, rule = B3/S23\n%s" % (
+        max_x - min_x + 1, max_y - min_y + 1, "".join(out))
+
+# Iterate over (apgcode, cost, rle) for every object with a chain back to
+# "0", depth first, taking the outputs of each object in sorted order
+def catalogue(min_paths):
+
+    children = {}
+    for output_code, edge in min_paths.items():
+        children.setdefault(edge[0], []).append(output_code)
+
+    stack = [(code, 0) for code in sorted(children.get("0", []), reverse=True)]
+    path = []
+
+    while stack:
+
+        output_code, depth = stack.pop()
+        edge = min_paths[output_code]
+
+        del path[depth:]
+        if path:
+            parent = path[-1]
+            frame = compose(parent.edge[4], parent.frame)
+            cost = parent.cost + edge_cost(edge)
+        else:
+            frame = IDENTITY
+            cost = edge_cost(edge)
+
+        path.append(Node(edge, frame, cost))
+
+        yield output_code, cost, path_rle(path)
+
+        for code in sorted(children.get(output_code, []), reverse=True):
+            stack.append((code, depth + 1))
+
+def write_catalogue(filename, out=CATALOGUE):
+
+    count = 0
+
+    with open(out, "w") as f:
+        for apgcode, cost, rle in catalogue(read_min_paths(filename)):
+            f.write("#C %s costs %d gliders\n%s\n" % (apgcode, cost, rle))
+            count += 1
+
+    return count
+
+def main(args):
+
+    out = CATALOGUE
+
+    if "--out" in args:
+        i = args.index("--out")
+        out = args[i+1]
+        args = args[:i] + args[i+2:]
+
+    start = time.time()
+    count = write_catalogue(args[0] if args else "min_paths.txt", out)
+
+    print("%d syntheses written to %s in %.1fs" %
+          (count, out, time.time() - start))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
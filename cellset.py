@@ -0,0 +1,194 @@
+# cellset.py
+#
+# Sets of cells kept in one contiguous buffer, for working on whole
+# patterns without a Python tuple (or list) per cell.
+#
+# A CellSet holds a flat cell list [x0, y0, x1, y1, ...], the format the
+# Golly API uses, in an array of C ints. Operations work on the x and y
+# columns of the array at once (slicing, map over the column and slice
+# assignment all run in C), so nothing is allocated per cell beyond the
+# ints themselves.
+#
+# Where cells need looking up, they are turned into keys: one int per
+# cell, x + y * WIDTH, as lifesim uses. Keys add like vectors, so shifting
+# a key by key(dx, dy) moves the cell, and sorting keys sorts cells into
+# reading order (by y, then x), the order Golly's getcells gives.
+#
+# A CellSet built from an array('i') uses the array itself, and
+# CellSet(cells).cells can be handed to anything that takes a flat list
+# and only indexes, slices or iterates over it. Golly's own functions need
+# real lists, which tolist() makes in one go.
+
+from array import array
+from itertools import repeat
+from operator import add, mul, rshift, sub
+
+try:
+    from itertools import imap
+except ImportError:
+    # Python 3
+    imap = map
+
+WIDTH = 1 << 32
+HALF = 1 << 31
+
+def key(x, y):
+    return x + y * WIDTH
+
+def coords(k):
+    y = (k + HALF) // WIDTH
+    return k - y * WIDTH, y
+
+# Flat cells from separate x and y columns
+def interleave(xs, ys):
+
+    cells = array("i", [0]) * (2 * len(xs))
+    cells[::2] = array("i", xs)
+    cells[1::2] = array("i", ys)
+
+    return cells
+
+# values * sign + offset, for sign 1 or -1
+def affine(values, sign, offset):
+
+    if sign == 1:
+        if offset == 0:
+            return values
+        return array("i", imap(add, values, repeat(offset)))
+
+    return array("i", imap(sub, repeat(offset), values))
+
+class CellSet(object):
+
+    __slots__ = ["cells"]
+
+    # From a flat cell list, which is used as it is if it's already an
+    # array('i')
+    def __init__(self, cells=()):
+
+        if isinstance(cells, array) and cells.typecode == "i":
+            self.cells = cells
+        else:
+            self.cells = array("i", cells)
+
+    # From keys, in the order given
+    @classmethod
+    def from_keys(cls, keys):
+
+        keys = list(keys)
+        ys = list(imap(rshift, imap(add, keys, repeat(HALF)), repeat(32)))
+        xs = imap(sub, keys, imap(mul, ys, repeat(WIDTH)))
+
+        return cls(interleave(list(xs), ys))
+
+    def tolist(self):
+        return self.cells.tolist()
+
+    def __len__(self):
+        return len(self.cells) // 2
+
+    def __bool__(self):
+        return bool(self.cells)
+
+    __nonzero__ = __bool__
+
+    def xs(self):
+        return self.cells[::2]
+
+    def ys(self):
+        return self.cells[1::2]
+
+    # The key of each cell, in order
+    def key_list(self):
+        return list(imap(add, self.cells[::2],
+                         imap(mul, self.cells[1::2], repeat(WIDTH))))
+
+    def keys(self):
+        return set(self.key_list())
+
+    def copy(self):
+        return CellSet(array("i", self.cells))
+
+    # [x, y, width, height] as Golly's getrect gives it, [] if empty
+    def bounding_box(self):
+
+        if not self.cells:
+            return []
+
+        xs, ys = self.xs(), self.ys()
+        x0, y0 = min(xs), min(ys)
+
+        return [x0, y0, max(xs) - x0 + 1, max(ys) - y0 + 1]
+
+    def translate(self, dx, dy):
+        return CellSet(interleave(affine(self.xs(), 1, dx),
+                                  affine(self.ys(), 1, dy)))
+
+    # The cells moved by the same transformation as Golly's transform:
+    # (x, y) goes to (x0 + a * x + b * y, y0 + c * x + d * y)
+    def transform(self, x0, y0, a=1, b=0, c=0, d=1):
+
+        xs, ys = self.xs(), self.ys()
+
+        if a * b == 0 and c * d == 0 and abs(a + b) == 1 and abs(c + d) == 1:
+            # One of the 8 orientations (or a projection)
+            new_xs = affine(xs if a else ys, a or b, x0)
+            new_ys = affine(xs if c else ys, c or d, y0)
+        else:
+            new_xs = [x0 + a * x + b * y for x, y in zip(xs, ys)]
+            new_ys = [y0 + c * x + d * y for x, y in zip(xs, ys)]
+
+        return CellSet(interleave(new_xs, new_ys))
+
+    # The cells in reading order, without duplicates
+    def sorted(self):
+        return CellSet.from_keys(sorted(self.keys()))
+
+    # Moved so that the top left corner of the bounding box is at the
+    # origin, in reading order
+    def normalise(self):
+
+        if not self.cells:
+            return CellSet()
+
+        x0, y0, _, _ = self.bounding_box()
+        return self.translate(-x0, -y0).sorted()
+
+    # The cells with x0 <= x < x0 + w and y0 <= y < y0 + h
+    def clip(self, x0, y0, w, h):
+
+        cells = self.cells
+        inside = array("i")
+
+        for i in range(0, len(cells), 2):
+            if x0 <= cells[i] < x0 + w and y0 <= cells[i+1] < y0 + h:
+                inside.append(cells[i])
+                inside.append(cells[i+1])
+
+        return CellSet(inside)
+
+    def union(self, other):
+        return CellSet.from_keys(sorted(self.keys() | other.keys()))
+
+    def difference(self, other):
+        return CellSet.from_keys(sorted(self.keys() - other.keys()))
+
+    def xor(self, other):
+        return CellSet.from_keys(sorted(self.keys() ^ other.keys()))
+
+    # Append another set's cells, without removing duplicates
+    def extend(self, other):
+        self.cells.extend(other.cells)
+
+    # Equal as sets of cells, in the same position
+    def __eq__(self, other):
+        return isinstance(other, CellSet) and self.keys() == other.keys()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(frozenset(self.keys()))
+
+    def __repr__(self):
+        return "CellSet(%r)" % self.tolist()
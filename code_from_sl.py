@@ -1,5 +1,10 @@
 import golly as g
-import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from object_table import ObjectTable, format_row
 
 # Obtains a canonical representation of any oscillator/spaceship that (in
 # some phase) fits within a 40-by-40 bounding box. This representation is
@@ -91,10 +96,9 @@ def compare_representations(a, b):
 
 apgcode = canonise()
 
-for s in gzip.open("translate17.txt.gz"):
-    niemiec, apg = s.split()
-    if apgcode == apg:
-        g.show(s)
-        g.exit()
+row = ObjectTable.load().by_apgcode(apgcode)
 
-g.show("?? " + apgcode)
+if row is not None:
+    g.show(format_row(row))
+else:
+    g.show("?? " + apgcode)
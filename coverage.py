@@ -0,0 +1,307 @@
+# coverage.py
+#
+# How well the known syntheses cover the objects that actually turn up,
+# from the chain costs in min_paths.txt and the object table (see
+# object_table.py), which brings in the byfreq.txt frequencies and the
+# still lists.
+#
+# The chain cost of every object is worked out in one pass over
+# min_paths (edges.chain_costs) and the objects in the table are added
+# into running totals: the frequency and number of objects at each cost,
+# per bit count and overall, and the frequency weighted sum of the
+# costs. The reports only read those totals, so they take no time
+# however large the table is.
+#
+# min_paths has one edge per object, so the edges form a tree and an
+# object's cost only depends on the objects above it. When an edge
+# changes, only the objects below it are costed again and only their
+# share of the totals is updated. whatif uses this to show what a file of
+# new edges would do to the coverage, without merging them.
+#
+# Usage:
+#   python coverage.py summary
+#   python coverage.py within N ...      share with a synthesis of <= N gliders
+#   python coverage.py missing [K]       top K objects by frequency with none
+#   python coverage.py bits [LO [HI]]    coverage by bit count
+#   python coverage.py whatif EDGE_FILE ...
+#
+# Add --paths FILE to use another min_paths file. The share of
+# occurrences is weighted by the byfreq.txt counts; objects without a
+# frequency count towards the numbers of objects only.
+
+from __future__ import print_function
+
+import sys
+
+from edges import chain_costs, edge_cost, read_edges, read_min_paths
+from object_table import UNKNOWN, ObjectTable
+
+MISSING_TOP = 1000
+
+class Coverage(object):
+
+    def __init__(self, min_paths, table):
+
+        self.edges = dict(min_paths)
+        self.costs = chain_costs(min_paths)
+
+        self.children = {}
+        for output, edge in self.edges.items():
+            self.children.setdefault(edge[0], set()).add(output)
+
+        # Frequency and bit count of every object in the table, and the
+        # objects with a frequency, most frequent first
+        self.freqs = {}
+        self.bits = {}
+        for i, apgcode in enumerate(table.apgcodes):
+            self.bits[apgcode] = table.bits[i]
+            if table.freqs[i] != UNKNOWN:
+                self.freqs[apgcode] = int(table.freqs[i])
+
+        self.ranked = sorted(self.freqs, key=lambda code: (-self.freqs[code],
+                                                           code))
+        self.table = table
+
+        # cost -> [objects, frequency], with None for no synthesis
+        self.by_cost = {}
+
+        # bit count -> [objects, objects with a synthesis, total cost]
+        self.by_bits = {}
+
+        self.total_freq = sum(self.freqs.values())
+        self.weighted_cost = 0
+
+        for apgcode in self.bits:
+            self.add(apgcode, 1)
+
+    def cost(self, apgcode):
+        return self.costs.get(apgcode)
+
+    # Add (sign 1) or remove (sign -1) an object's share of the totals at
+    # its current cost
+    def add(self, apgcode, sign):
+
+        if apgcode not in self.bits:
+            return
+
+        cost = self.costs.get(apgcode)
+        freq = self.freqs.get(apgcode, 0)
+
+        bucket = self.by_cost.setdefault(cost, [0, 0])
+        bucket[0] += sign
+        bucket[1] += sign * freq
+
+        bits = self.by_bits.setdefault(self.bits[apgcode], [0, 0, 0])
+        bits[0] += sign
+
+        if cost is not None:
+            bits[1] += sign
+            bits[2] += sign * cost
+            self.weighted_cost += sign * freq * cost
+
+    def set_cost(self, apgcode, cost):
+
+        self.add(apgcode, -1)
+        self.costs[apgcode] = cost
+        self.add(apgcode, 1)
+
+    # Replace the edge of edge's output and cost it and everything below
+    # it again. Returns the objects whose cost changed, or None if the
+    # edge would make the chain loop, in which case nothing is changed.
+    def set_edge(self, edge):
+
+        input_code, output = edge[0], edge[1]
+
+        # The input mustn't be below the output
+        code = input_code
+        seen = set()
+        while code in self.edges and code not in seen:
+            if code == output:
+                return None
+            seen.add(code)
+            code = self.edges[code][0]
+
+        old = self.edges.get(output)
+        if old is not None:
+            self.children[old[0]].discard(output)
+
+        self.edges[output] = edge
+        self.children.setdefault(input_code, set()).add(output)
+
+        changed = []
+        stack = [output]
+
+        while stack:
+
+            code = stack.pop()
+            parent = self.edges[code][0]
+
+            parent_cost = 0 if parent == "0" else self.costs.get(parent)
+            if parent_cost is None:
+                cost = None
+            else:
+                cost = parent_cost + edge_cost(self.edges[code])
+
+            if cost == self.costs.get(code):
+                continue
+
+            self.set_cost(code, cost)
+            changed.append(code)
+            stack.extend(self.children.get(code, ()))
+
+        return changed
+
+    # Use every edge that makes its output cheaper, including edges that
+    # only do so once other edges have made their input cheaper, until
+    # none is left. An edge that is replaced stays in the running, since
+    # its input may get cheaper later. Returns the objects whose cost went
+    # down.
+    def improve(self, edges):
+
+        by_input = {}
+        for edge in edges:
+            if edge[0] != edge[1]:
+                by_input.setdefault(edge[0], []).append(edge)
+
+        pending = list(by_input)
+        improved = set()
+
+        while pending:
+
+            input_code = pending.pop()
+            input_cost = 0 if input_code == "0" else self.costs.get(input_code)
+
+            if input_cost is None:
+                continue
+
+            for edge in by_input.get(input_code, ()):
+
+                old = self.costs.get(edge[1])
+                if old is not None and input_cost + edge_cost(edge) >= old:
+                    continue
+
+                replaced = self.edges.get(edge[1])
+
+                changed = self.set_edge(edge)
+                if not changed:
+                    continue
+
+                if replaced is not None:
+                    by_input.setdefault(replaced[0], []).append(replaced)
+
+                improved.update(changed)
+                pending.extend(code for code in changed if code in by_input)
+
+        return improved
+
+    # The number of objects and the share of the total frequency with a
+    # synthesis of at most n gliders
+    def within(self, n):
+
+        objects = freq = 0
+
+        for cost, (count, f) in self.by_cost.items():
+            if cost is not None and cost <= n:
+                objects += count
+                freq += f
+
+        return objects, float(freq) / self.total_freq if self.total_freq else 0
+
+    # The share of the total frequency with a synthesis and the mean cost
+    # weighted by frequency over those
+    def expected_cost(self):
+
+        covered = self.total_freq - self.by_cost.get(None, [0, 0])[1]
+
+        if not covered:
+            return 0.0, None
+
+        return (float(covered) / self.total_freq,
+                float(self.weighted_cost) / covered)
+
+    # The most frequent k objects with no synthesis, as (rank, apgcode)
+    def missing(self, k=MISSING_TOP):
+        return [(rank + 1, code) for rank, code in enumerate(self.ranked[:k])
+                if self.costs.get(code) is None]
+
+    def objects(self):
+        return sum(count for count, _ in self.by_cost.values())
+
+    def covered(self):
+        return self.objects() - self.by_cost.get(None, [0, 0])[0]
+
+def load(paths_file="min_paths.txt"):
+    return Coverage(read_min_paths(paths_file), ObjectTable.load())
+
+def print_summary(coverage):
+
+    share, mean = coverage.expected_cost()
+
+    print("%d of %d objects have a synthesis, covering %.4f%% of occurrences"
+          % (coverage.covered(), coverage.objects(), 100 * share))
+
+    if mean is not None:
+        print("Expected cost per object weighted by frequency: %.2f gliders"
+              % mean)
+
+def main(args):
+
+    if not args:
+        print("usage: python coverage.py summary | within N ... | "
+              "missing [K] | bits [LO [HI]] | whatif EDGE_FILE ... "
+              "[--paths FILE]")
+        return 1
+
+    paths_file = "min_paths.txt"
+
+    if "--paths" in args:
+        i = args.index("--paths")
+        paths_file = args[i+1]
+        args = args[:i] + args[i+2:]
+
+    command, args = args[0], args[1:]
+    coverage = load(paths_file)
+
+    if command == "summary":
+        print_summary(coverage)
+
+    elif command == "within":
+        for n in map(int, args):
+            objects, share = coverage.within(n)
+            print("<= %d gliders: %d objects, %.4f%% of occurrences" %
+                  (n, objects, 100 * share))
+
+    elif command == "missing":
+        k = int(args[0]) if args else MISSING_TOP
+        for rank, code in coverage.missing(k):
+            row = coverage.table.by_apgcode(code)
+            print("%5d %-10s %-40s %d" % (rank, row.niemiec, code, row.freq))
+
+    elif command == "bits":
+        lo, hi = min(coverage.by_bits), max(coverage.by_bits)
+        if args:
+            lo = hi = int(args[0])
+        if len(args) > 1:
+            hi = int(args[1])
+        for bits in range(lo, hi + 1):
+            objects, covered, total = coverage.by_bits.get(bits, [0, 0, 0])
+            if objects:
+                mean = "%.2f" % (float(total) / covered) if covered else "-"
+                print("%3d bits: %d of %d with a synthesis, mean cost %s" %
+                      (bits, covered, objects, mean))
+
+    elif command == "whatif":
+        print_summary(coverage)
+        improved = coverage.improve(edge for filename in args
+                                    for edge in read_edges(filename))
+        print("With the new edges, %d objects are cheaper:" % len(improved))
+        print_summary(coverage)
+
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
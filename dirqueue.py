@@ -0,0 +1,402 @@
+# dirqueue.py
+#
+# Canonicalisation of synths/ spread over several machines, with nothing
+# shared but a directory (eg. over NFS). Every worker runs the same loop
+# as a bulk run of canonv11.py, one file at a time, and the coordinator
+# merges what they found into one edge file at the end.
+#
+# The queue directory holds:
+#
+#   jobs/J              a copy of each synthesis file, J = <sha1>_<filename>
+#   pending/J#N         a job waiting for a worker, tried N times before
+#   leased/J#N@WORKER   a job being worked on
+#   done/J#N@WORKER     a finished job, with its number of edges and
+#                       failures, whose edges are in shards/J#N@WORKER
+#   failed/J#N@WORKER   a job that raised an error or was tried too often,
+#                       with the error in the file
+#   errors/             the syntheses the workers couldn't canonicalise
+#
+# Every change of state is a rename of the job's token file, which is
+# atomic on a single filesystem, so when two workers race for a token
+# exactly one of them gets it. A worker touches its lease file every
+# HEARTBEAT_SECONDS. A lease that hasn't been touched for LEASE_SECONDS
+# is taken to belong to a dead worker and any worker moves it back to
+# pending/ (or to failed/ after MAX_ATTEMPTS tries). Leases are timed
+# against the file modification times, so the machines' clocks should
+# agree to well within LEASE_SECONDS.
+#
+# A worker writes its shard before moving its lease to done/. If the
+# lease was taken away in the meantime that rename fails, and the worker
+# throws the shard away, so every job in done/ has exactly one shard.
+#
+# Each worker uses the objects.db of its own working directory; sqlite
+# shouldn't be shared over a network filesystem.
+#
+# Usage:
+#   python dirqueue.py enqueue QUEUE [SYNTHS_DIR]
+#   python dirqueue.py worker QUEUE [--name NAME] [--lease SECONDS]
+#   python dirqueue.py status QUEUE
+#   python dirqueue.py requeue QUEUE [--lease SECONDS]
+#   python dirqueue.py merge QUEUE [--out edges.txt]
+#
+# Workers carry on until every job is done or failed. Several can be run
+# on one machine, each in its own working directory, to try a queue out
+# locally. merge writes the edges of every finished job, sorted by output
+# and without duplicates, ready for merge_edges.py.
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from canonv11 import canonise_file, file_hash
+from merge_edges import external_sort
+
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+POLL_SECONDS = 10
+
+MAX_ATTEMPTS = 3
+
+STATES = ["pending", "leased", "done", "failed"]
+
+DIRECTORIES = ["jobs", "shards", "errors"] + STATES
+
+def make_queue(queue):
+
+    for name in DIRECTORIES:
+        path = os.path.join(queue, name)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+# A name safe to use in token names
+def worker_name(name=None):
+
+    if name is None:
+        name = "%s-%d" % (socket.gethostname(), os.getpid())
+
+    for ch in "@#/.":
+        name = name.replace(ch, "-")
+
+    return name
+
+# Split a token name into (job, attempts, worker), worker None if pending
+def parse_token(token):
+
+    worker = None
+    if "@" in token:
+        token, worker = token.rsplit("@", 1)
+
+    job, attempts = token.rsplit("#", 1)
+
+    return job, int(attempts), worker
+
+def token_name(job, attempts, worker=None):
+
+    token = "%s#%d" % (job, attempts)
+
+    return token if worker is None else token + "@" + worker
+
+# The original name of a job's synthesis file
+def job_filename(job):
+    return job.split("_", 1)[1]
+
+# Add every file in synths_dir that isn't in the queue already. Returns
+# the number of jobs added.
+def enqueue(queue, synths_dir="synths"):
+
+    make_queue(queue)
+    added = 0
+
+    for filename in sorted(os.listdir(synths_dir)):
+
+        path = os.path.join(synths_dir, filename)
+        job = "%s_%s" % (file_hash(path), filename)
+        target = os.path.join(queue, "jobs", job)
+
+        if os.path.exists(target):
+            continue
+
+        # The copy is complete before anything can see it
+        temp = os.path.join(queue, "jobs", ".%s.tmp" % job)
+        shutil.copyfile(path, temp)
+        os.rename(temp, target)
+
+        open(os.path.join(queue, "pending", token_name(job, 0)), "w").close()
+        added += 1
+
+    return added
+
+# Move a token from one state to another. Returns False if it wasn't
+# there, ie. someone else moved it first.
+def move(queue, state, token, new_state, new_token=None):
+
+    try:
+        os.rename(os.path.join(queue, state, token),
+                  os.path.join(queue, new_state, new_token or token))
+    except OSError:
+        return False
+
+    return True
+
+# Claim a pending job. Returns the lease token, or None if there are no
+# pending jobs left.
+def claim(queue, worker):
+
+    tokens = os.listdir(os.path.join(queue, "pending"))
+
+    # Spread the workers out over the queue rather than having them all
+    # race for the same token
+    random.shuffle(tokens)
+
+    for token in tokens:
+
+        job, attempts, _ = parse_token(token)
+        lease = token_name(job, attempts, worker)
+
+        # A rename keeps the modification time, so touch the token first
+        # or the new lease could look expired
+        try:
+            os.utime(os.path.join(queue, "pending", token), None)
+        except OSError:
+            continue
+
+        if move(queue, "pending", token, "leased", lease):
+            return lease
+
+    return None
+
+# Move leases that haven't been touched for lease_seconds back to
+# pending/, or to failed/ once they have been tried MAX_ATTEMPTS times.
+# Returns the number of leases moved.
+def requeue_expired(queue, lease_seconds=LEASE_SECONDS):
+
+    now = time.time()
+    moved = 0
+
+    for token in os.listdir(os.path.join(queue, "leased")):
+
+        try:
+            age = now - os.path.getmtime(os.path.join(queue, "leased", token))
+        except OSError:
+            continue
+
+        if age < lease_seconds:
+            continue
+
+        job, attempts, _ = parse_token(token)
+
+        if attempts + 1 < MAX_ATTEMPTS:
+            moved += move(queue, "leased", token, "pending",
+                          token_name(job, attempts + 1))
+        else:
+            moved += move(queue, "leased", token, "failed")
+
+    return moved
+
+# Touches a lease file every HEARTBEAT_SECONDS until stopped, noting if
+# the lease has gone
+class Heartbeat(threading.Thread):
+
+    def __init__(self, path, interval=HEARTBEAT_SECONDS):
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.path, None)
+            except OSError:
+                self.lost = True
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+# Canonicalise one leased job. Returns the number of edges found, or None
+# if the lease was lost. A job that raises an error is moved to failed/.
+def run_job(queue, lease, work_dir, heartbeat_seconds=HEARTBEAT_SECONDS):
+
+    job, _, _ = parse_token(lease)
+    filename = job_filename(job)
+
+    heartbeat = Heartbeat(os.path.join(queue, "leased", lease),
+                          heartbeat_seconds)
+    heartbeat.start()
+
+    try:
+        # Work on a local copy, the shared filesystem may be slow
+        path = os.path.join(work_dir, filename)
+        shutil.copyfile(os.path.join(queue, "jobs", job), path)
+
+        lines, err_count = canonise_file(path, filename,
+                                         os.path.join(queue, "errors"))
+
+    except Exception:
+        heartbeat.stop()
+        if os.path.exists(path):
+            os.remove(path)
+        if move(queue, "leased", lease, "failed"):
+            with open(os.path.join(queue, "failed", lease), "w") as f:
+                f.write(traceback.format_exc())
+        raise
+
+    heartbeat.stop()
+    os.remove(path)
+
+    shard = os.path.join(queue, "shards", lease)
+    temp = os.path.join(queue, "shards", ".%s.tmp" % lease)
+
+    with open(temp, "w") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.rename(temp, shard)
+
+    if heartbeat.lost or not move(queue, "leased", lease, "done"):
+        os.remove(shard)
+        return None
+
+    # The token is this worker's for good now
+    with open(os.path.join(queue, "done", lease), "w") as f:
+        f.write("%d %d\n" % (len(lines), err_count))
+
+    return len(lines)
+
+# The number of jobs in each state
+def queue_status(queue):
+    return dict((state, len(os.listdir(os.path.join(queue, state))))
+                for state in STATES)
+
+# Work through the queue until every job is done or failed. Returns the
+# number of jobs this worker finished.
+def run_worker(queue, name=None, lease_seconds=LEASE_SECONDS,
+               poll_seconds=POLL_SECONDS):
+
+    worker = worker_name(name)
+    work_dir = tempfile.mkdtemp(prefix="dirqueue-")
+    finished = 0
+
+    try:
+        while True:
+
+            requeue_expired(queue, lease_seconds)
+            lease = claim(queue, worker)
+
+            if lease is None:
+                if not os.listdir(os.path.join(queue, "leased")):
+                    break
+                # Wait in case a lease expires
+                time.sleep(poll_seconds)
+                continue
+
+            try:
+                edges = run_job(queue, lease, work_dir,
+                                min(HEARTBEAT_SECONDS, lease_seconds / 4))
+            except Exception:
+                traceback.print_exc()
+                print(worker, "failed", lease)
+                continue
+
+            if edges is None:
+                print(worker, "lost the lease on", lease)
+            else:
+                print(worker, "finished", lease, "with", edges, "edges")
+                finished += 1
+
+    finally:
+        shutil.rmtree(work_dir)
+
+    return finished
+
+# Merge the shards of every finished job into one edge file, sorted by
+# output without duplicates. Returns the number of shards merged.
+def merge(queue, out="edges.txt"):
+
+    tokens = sorted(os.listdir(os.path.join(queue, "done")))
+    shards = [os.path.join(queue, "shards", token) for token in tokens]
+
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(out)))
+
+    try:
+        merged = external_sort(shards, directory)
+        if os.path.exists(out):
+            os.remove(out)
+        shutil.move(merged, out)
+    finally:
+        shutil.rmtree(directory)
+
+    return len(shards)
+
+def main(args):
+
+    if len(args) < 2:
+        print("usage: python dirqueue.py enqueue QUEUE [SYNTHS_DIR] | "
+              "worker QUEUE [--name NAME] [--lease SECONDS] | status QUEUE | "
+              "requeue QUEUE [--lease SECONDS] | merge QUEUE [--out FILE]")
+        return 1
+
+    options = {"--name": None, "--lease": LEASE_SECONDS, "--out": "edges.txt"}
+
+    for name in list(options):
+        if name in args:
+            i = args.index(name)
+            options[name] = args[i+1]
+            args = args[:i] + args[i+2:]
+
+    command, queue = args[0], args[1]
+    lease_seconds = float(options["--lease"])
+
+    if command == "enqueue":
+        added = enqueue(queue, args[2] if len(args) > 2 else "synths")
+        print(added, "jobs added")
+
+    elif command == "worker":
+        finished = run_worker(queue, options["--name"], lease_seconds,
+                              min(POLL_SECONDS, lease_seconds))
+        print(finished, "jobs finished")
+
+    elif command == "status":
+        status = queue_status(queue)
+        print(" ".join("%s %d" % (state, status[state]) for state in STATES))
+
+        now = time.time()
+        for token in sorted(os.listdir(os.path.join(queue, "leased"))):
+            age = now - os.path.getmtime(os.path.join(queue, "leased", token))
+            print("  %s last heartbeat %.0fs ago" % (token, age))
+
+    elif command == "requeue":
+        print(requeue_expired(queue, lease_seconds), "expired leases requeued")
+
+    elif command == "merge":
+        status = queue_status(queue)
+        if status["pending"] or status["leased"]:
+            print("Warning: %d jobs pending and %d leased are left out" %
+                  (status["pending"], status["leased"]))
+        count = merge(queue, options["--out"])
+        print(count, "shards merged into", options["--out"])
+
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
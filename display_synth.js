@@ -18,19 +18,29 @@ var g_nw = [[0, 0, 1, 0, 2, 0, 0, 1, 1, 2],
             [0, -1, 1, -1, 0, 0, 2, 0, 0, 1],
             [0, -1, 1, -1, -1, 0, 0, 0, 1, 1]];
 
-function append_with_shift(cells1, cells2, x, y) {
-    for (var i = 0; i < cells2.length; i += 2) {
-        cells1.push(cells2[i] + x)
-        cells1.push(cells2[i+1] + y)
+// Cells are written into an Int32Array with room for the whole synthesis,
+// worked out before anything is drawn, rather than grown with push
+
+// Write cells shifted by (sx, sy), moved by trans and then shifted by
+// (dx, dy) into out
+function put_cells(out, cells, sx, sy, trans, dx, dy) {
+    var buf = out.cells;
+    var n = out.length;
+    for (var i = 0; i < cells.length; i += 2) {
+        var x = cells[i] + sx;
+        var y = cells[i+1] + sy;
+        buf[n++] = trans[0] + x * trans[2] + y * trans[3] + dx;
+        buf[n++] = trans[1] + x * trans[4] + y * trans[5] + dy;
     }
+    out.length = n;
 }
 
-function add_gliders(cells, gs, gcells, vx, vy, t) {
+function put_gliders(out, gs, gcells, vx, vy, t, trans, dx, dy) {
     for (var i = 0; i < gs.length; i += 2) {
         var phase = (t + gs[i+1]) % 4;
         if (phase < 0) phase += 4;
         var d = (t + gs[i+1] - phase) / 4;
-        append_with_shift(cells, gcells[phase], gs[i] + vx * d, vy * d);
+        put_cells(out, gcells[phase], gs[i] + vx * d, vy * d, trans, dx, dy);
     }
 }
 
@@ -106,131 +116,197 @@ function decodeCanon(apgcode) {
     return cells;
 }
 
-function display_edge(cells, edge, post_transform, offset) {
+var decoded = new Object();
+
+function decode_cached(apgcode) {
+    if (!decoded.hasOwnProperty(apgcode))
+        decoded[apgcode] = decodeCanon(apgcode);
+    return decoded[apgcode];
+}
 
-    var input_cells = decodeCanon(edge.input_code)
-    add_gliders(input_cells, edge.gs_ne, g_ne,  1, -1, 0);
-    add_gliders(input_cells, edge.gs_se, g_se,  1,  1, 0);
-    add_gliders(input_cells, edge.gs_sw, g_sw, -1,  1, 0);
-    add_gliders(input_cells, edge.gs_nw, g_nw, -1, -1, 0);
+// Number of values display_edge writes for an edge
+function edge_size(edge) {
+    return decode_cached(edge.input_code).length
+        + decode_cached(edge.output_code).length + 10 * edge.cost;
+}
 
-    var output_cells = decodeCanon(edge.output_code);
+function display_edge(out, edge, post_transform, offset) {
 
     var new_transform = compose(inverse(edge.transform), post_transform);
 
-    transform(input_cells, new_transform);
-    transform(output_cells, post_transform);
+    put_cells(out, decode_cached(edge.input_code), 0, 0, new_transform, 0, offset);
+    put_gliders(out, edge.gs_ne, g_ne,  1, -1, 0, new_transform, 0, offset);
+    put_gliders(out, edge.gs_se, g_se,  1,  1, 0, new_transform, 0, offset);
+    put_gliders(out, edge.gs_sw, g_sw, -1,  1, 0, new_transform, 0, offset);
+    put_gliders(out, edge.gs_nw, g_nw, -1, -1, 0, new_transform, 0, offset);
 
-    append_with_shift(cells, input_cells, 0, offset);
-    append_with_shift(cells, output_cells, 100, offset);
+    put_cells(out, decode_cached(edge.output_code), 0, 0, post_transform, 100, offset);
 
     return new_transform;
 
 }
 
-function get_synthesis(cells, apgcode) {
-    
-    var offset = 0;
-    var cost = 0;
-    var trans = [0,0,1,0,0,1];
+// The edges leading from "0" to apgcode, last edge first, or null if
+// some object on the way is unknown
+function get_chain(apgcode) {
+
+    var chain = [];
 
     while (apgcode != "0") {
-        
+
         if (!min_paths.hasOwnProperty(apgcode))
-            return "unknown";
+            return null;
 
         var edge = min_paths[apgcode];
+        chain.push(edge);
+        apgcode = edge.input_code;
+    }
 
-        trans = display_edge(cells, edge, trans, offset);
+    return chain;
+}
 
-        apgcode = edge.input_code;
-        cost += edge.cost;
+// The cells of every step of a synthesis, one step per 100 rows, as
+// {cells, length, cost}, or null if it isn't known
+function get_synthesis(apgcode) {
 
-        offset -= 100;
+    var chain = get_chain(apgcode);
+    if (chain == null) return null;
+
+    var size = 0;
+    var cost = 0;
+    for (var i = 0; i < chain.length; i++) {
+        size += edge_size(chain[i]);
+        cost += chain[i].cost;
     }
 
-    return cost;
+    var out = {cells: new Int32Array(size), length: 0, cost: cost};
+    var trans = [0,0,1,0,0,1];
+
+    for (var i = 0; i < chain.length; i++)
+        trans = display_edge(out, chain[i], trans, -100 * i);
+
+    return out;
 }
 
-function add_symbol(out_pair, num, symbol) {
-    if (num == 0) return;
-    if (num > 1) symbol = num.toString() + symbol;
-    out_pair[1] += symbol.length;
-    if (out_pair[1] > 77) {
-        out_pair[0] += "<br>";
-        out_pair[1] = symbol.length;
+// Lines of RLE body are passed to emit this many at a time
+var RLE_CHUNK_LINES = 256;
+
+// Cell indices sorted by key, in time linear in the number of cells plus
+// the range of keys. The sort is stable.
+function counting_sort(order, cells, offset, min, range) {
+
+    var counts = new Int32Array(range + 1);
+    var n = order.length;
+
+    for (var i = 0; i < n; i++)
+        counts[cells[2*order[i] + offset] - min + 1]++;
+    for (var i = 1; i <= range; i++)
+        counts[i] += counts[i-1];
+
+    var sorted = new Int32Array(n);
+    for (var i = 0; i < n; i++) {
+        var j = order[i];
+        sorted[counts[cells[2*j + offset] - min]++] = j;
     }
-    out_pair[0] += symbol;
-}
 
-function cells_to_rle(cells) {
+    return sorted;
+}
 
-    if (cells.length == 0) return "x = 0, y = 0, rule = B3/S23<br>!";
+// Write the RLE of the first length values of cells to emit(text, done)
+// in pieces, each ending at a line break, with lines no longer than
+// add_symbol allows
+function write_rle(cells, length, emit) {
 
-    var minx = 99999;
-    var maxx = -99999;
-    var miny = 99999;
-    var maxy = -99999;
+    var n = length / 2;
 
-    for (var i = 0; i < cells.length; i += 2) {
+    if (n == 0) {
+        emit("x = 0, y = 0, rule = B3/S23<br>!", true);
+        return;
+    }
 
-        x = cells[i];
-        y = cells[i+1];
+    var minx = cells[0], maxx = cells[0];
+    var miny = cells[1], maxy = cells[1];
 
+    for (var i = 2; i < length; i += 2) {
+        var x = cells[i];
+        var y = cells[i+1];
         if (x > maxx) maxx = x;
         if (x < minx) minx = x;
         if (y > maxy) maxy = y;
         if (y < miny) miny = y;
-
-    }
-
-    var pairs = [];
-    for (var i = 0; i < cells.length; i += 2)
-        pairs.push((cells[i]-minx) + 1024 * cells[i+1]);
-    pairs.sort(function(a,b){return a-b});
-
-    for (var i = 0; i < pairs.length; i++) {
-        cells[2*i] = pairs[i] & 1023;
-        cells[2*i+1] = pairs[i] >> 10;
     }
 
     var w = maxx - minx + 1;
     var h = maxy - miny + 1;
-    var output = "x = " + w.toString() + ", y = " + h.toString() + ", rule = B3/S23<br>";
+    emit("x = " + w + ", y = " + h + ", rule = B3/S23<br>", false);
+
+    // Sort by x and then by row, so the cells come in reading order
+    var order = new Int32Array(n);
+    for (var i = 0; i < n; i++) order[i] = i;
+    order = counting_sort(order, cells, 0, minx, w);
+    order = counting_sort(order, cells, 1, miny, h);
+
+    var lines = [];
+    var line = "";
+
+    function add_symbol(num, symbol) {
+        if (num == 0) return;
+        if (num > 1) symbol = num + symbol;
+        if (line.length + symbol.length > 77) {
+            lines.push(line);
+            line = "";
+            if (lines.length == RLE_CHUNK_LINES) {
+                emit(lines.join("<br>") + "<br>", false);
+                lines = [];
+            }
+        }
+        line += symbol;
+    }
 
-    var x = cells[0];
-    var y = cells[1];
-    var on_start = cells[0];
+    var x = cells[2*order[0]] - minx;
+    var y = cells[2*order[0]+1];
+    var on_start = x;
     var off_start = 0;
-    var out_pair = [output, 0];
 
-    for (var i = 2; i < cells.length; i += 2) {
+    for (var i = 1; i < n; i++) {
 
-        if (cells[i] == x + 1 && cells[i+1] == y) {
+        var cx = cells[2*order[i]] - minx;
+        var cy = cells[2*order[i]+1];
+
+        if (cy == y && cx <= x) continue;
+
+        if (cy == y && cx == x + 1) {
             x++;
         } else {
-            
-            add_symbol(out_pair, on_start - off_start, "b");
-            add_symbol(out_pair, x + 1 - on_start, "o");
+
+            add_symbol(on_start - off_start, "b");
+            add_symbol(x + 1 - on_start, "o");
 
             off_start = x + 1;
 
-            var new_lines = cells[i+1] - y;
-            if (new_lines > 0) {
-                add_symbol(out_pair, new_lines, "$");
+            if (cy > y) {
+                add_symbol(cy - y, "$");
                 off_start = 0;
             }
 
-            x = on_start = cells[i];
-            y = cells[i+1];
-        }        
+            x = on_start = cx;
+            y = cy;
+        }
     }
 
-    add_symbol(out_pair, on_start - off_start, "b");
-    add_symbol(out_pair, x + 1 - on_start, "o");
+    add_symbol(on_start - off_start, "b");
+    add_symbol(x + 1 - on_start, "o");
+
+    lines.push(line + "!");
+    emit(lines.join("<br>"), true);
 
-    return out_pair[0] + "!";
-    
+}
+
+function cells_to_rle(cells, length) {
+    var pieces = [];
+    write_rle(cells, length === undefined ? cells.length : length,
+              function(text, done) { pieces.push(text); });
+    return pieces.join("");
 }
 
 function to_int_array(s) {
@@ -241,18 +317,26 @@ function to_int_array(s) {
     return sp;
 }
 
-function apgcode_to_synthesis_rle(apgcode) {
+// Write the RLE of an object's synthesis to emit(text, done) in pieces,
+// as display_synth_worker.js sends it to the page
+function write_synthesis_rle(apgcode, emit) {
 
-    var cells = [];
-    var cost = get_synthesis(cells, apgcode);
-    
-    if (cost == "unknown") 
-        return cost;
-    else {
-        var rle = cells_to_rle(cells);
-        return "#C " + apgcode + " costs " + cost + " gliders<br>" + rle;
+    var synth = get_synthesis(apgcode);
+
+    if (synth == null) {
+        emit("unknown", true);
+        return;
     }
 
+    emit("#C " + apgcode + " costs " + synth.cost + " gliders<br>", false);
+    write_rle(synth.cells, synth.length, emit);
+
+}
+
+function apgcode_to_synthesis_rle(apgcode) {
+    var pieces = [];
+    write_synthesis_rle(apgcode, function(text, done) { pieces.push(text); });
+    return pieces.join("");
 }
 
 function string_to_edge(s) {
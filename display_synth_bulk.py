@@ -1,7 +1,13 @@
 import golly as g
 import os
+import sys
 from urllib2 import urlopen
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from edges import compose, inverse
+from object_store import get_store
+
 URL = "http://raw.githubusercontent.com/ceebo/glider_synth/master/min_paths.txt"
 
 GLIDERS = [(g.parse("3o$2bo$bo!", -2, 0), 1, -1),   #NE
@@ -24,32 +30,14 @@ def get_gliders(glider_lists, t):
 
     return ret
 
-# return the transformation t2 o t1
-def compose(t1, t2):
-
-    x, y, a, b, c, d = g.transform(g.transform([0, 0, 1, 0, 0, 1], *t1), *t2)
-
-    return (x, y, a-x, c-x, b-y, d-y)
-
-# return the inverse of t
-def inverse(t):
-
-    x, y, a, b, c, d = t
-
-    det = a * d - b * c
-
-    # assert(det in [-1, +1])
-
-    inv = [det * i for i in [d, -b, -c, a]]
-
-    return g.transform([-x, -y], 0, 0, *inv) + inv
-
 def display_edge(edge, post_transform=(0,0,1,0,0,1)):
 
     input_code, output_code, phase, glider_lists, transform = edge
 
-    input_cells = decodeCanon(input_code) + get_gliders(glider_lists, 0)
-    output_cells = g.evolve(decodeCanon(output_code), phase)
+    store = get_store()
+
+    input_cells = store.phase_cells(input_code) + get_gliders(glider_lists, 0)
+    output_cells = store.phase_cells(output_code, phase)
 
     new_transform = compose(inverse(transform), post_transform)
 
@@ -0,0 +1,11 @@
+// Builds the RLE of a synthesis off the page's thread. Post an apgcode
+// and the RLE comes back in pieces as {text, done}, so long chains show
+// up as they are written.
+
+importScripts('display_synth.js');
+
+onmessage = function(e) {
+    write_synthesis_rle(e.data, function(text, done) {
+        postMessage({text: text, done: done});
+    });
+};
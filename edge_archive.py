@@ -0,0 +1,366 @@
+# edge_archive.py
+#
+# A compressed archive format for large collections of edges, with
+# streaming decode and random access by output object.
+#
+# Layout:
+#
+#   magic         b"EDGEARC2\n"
+#   blocks        blocks of up to BLOCK_SIZE edges
+#   footer        zlib compressed dictionary and block index
+#   trailer       footer offset and length, 8 bytes each, little endian
+#
+# Every apgcode is stored once, in the dictionary, in sorted order, each
+# as the length of the prefix it shares with the one before and the rest
+# of it. Edges refer to codes by their position in the dictionary. Edges
+# are sorted by output so each block covers a range of output ids, which
+# the block index records.
+#
+# A block is its number of edges followed by one zlib compressed column
+# of varints for each of these fields, in this order, so that similar
+# values are compressed together:
+#
+#   input id
+#   output id minus the previous output id in the block
+#   phase * 8 + index of the transform's matrix in MATRICES
+#   transform offset x (zigzag)
+#   transform offset y (zigzag)
+#   glider count, for each direction
+#   change in lane from the previous glider of the direction (zigzag)
+#   change in timing from the previous glider of the direction (zigzag)
+#
+# Each column is preceded by its compressed length.
+#
+# Decoded edges are the same tuples that edge_from_string returns.
+#
+# min_paths.txt (459KB) packs to 91KB: 5 times smaller than the text
+# and 28% smaller than gzip -9 (127KB), well short of 10 times. Over
+# half of it is the lanes and timings of the gliders, which are close to
+# random and don't compress much further.
+#
+# Usage:
+#   python edge_archive.py pack ARCHIVE EDGE_FILE ...
+#   python edge_archive.py unpack ARCHIVE
+#   python edge_archive.py get ARCHIVE APGCODE ...
+
+from __future__ import print_function
+
+import bisect
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+
+from edges import edge_from_string, edge_to_string
+from merge_edges import external_sort
+
+MAGIC = b"EDGEARC2\n"
+
+BLOCK_SIZE = 4096
+
+COLUMNS = 8
+
+# The order of the output transforms listed in README.md
+MATRICES = [(1, 0, 0, 1), (-1, 0, 0, 1), (1, 0, 0, -1), (-1, 0, 0, -1),
+            (0, 1, 1, 0), (0, -1, 1, 0), (0, 1, -1, 0), (0, -1, -1, 0)]
+
+def put_varint(out, n):
+
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+
+    out.append(n)
+
+def put_signed(out, n):
+    put_varint(out, 2 * n if n >= 0 else -2 * n - 1)
+
+# Reads varints from a bytearray
+class Reader(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+
+        n = shift = 0
+
+        while True:
+            b = self.data[self.pos]
+            self.pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def signed(self):
+        n = self.varint()
+        return n >> 1 if n % 2 == 0 else -((n + 1) >> 1)
+
+    def bytes(self, n):
+        self.pos += n
+        return bytes(self.data[self.pos - n:self.pos])
+
+def encode_block(edges, ids):
+
+    columns = [bytearray() for _ in range(COLUMNS)]
+    inputs, outputs, packed, xs, ys, counts, lanes, timings = columns
+    last_output = 0
+
+    for input_code, output_code, phase, glider_lists, transform in edges:
+
+        output = ids[output_code]
+
+        put_varint(inputs, ids[input_code])
+        put_varint(outputs, output - last_output)
+        put_varint(packed, phase * 8 + MATRICES.index(tuple(transform[2:])))
+        put_signed(xs, transform[0])
+        put_signed(ys, transform[1])
+
+        for glider_list in glider_lists:
+
+            put_varint(counts, len(glider_list))
+            lane = timing = 0
+
+            for x, t in glider_list:
+                put_signed(lanes, x - lane)
+                put_signed(timings, t - timing)
+                lane, timing = x, t
+
+        last_output = output
+
+    out = bytearray()
+    put_varint(out, len(edges))
+
+    for column in columns:
+        data = zlib.compress(bytes(column), 9)
+        put_varint(out, len(data))
+        out += data
+
+    return bytes(out)
+
+def decode_block(data, codes):
+
+    reader = Reader(bytearray(data))
+    count = reader.varint()
+
+    columns = []
+    for _ in range(COLUMNS):
+        data = reader.bytes(reader.varint())
+        columns.append(Reader(bytearray(zlib.decompress(data))))
+
+    inputs, outputs, packed, xs, ys, counts, lanes, timings = columns
+    output = 0
+
+    for _ in range(count):
+
+        input_code = codes[inputs.varint()]
+        output += outputs.varint()
+
+        n = packed.varint()
+        x = xs.signed()
+        y = ys.signed()
+
+        glider_lists = []
+
+        for _ in range(4):
+
+            glider_list = []
+            lane = timing = 0
+
+            for _ in range(counts.varint()):
+                lane += lanes.signed()
+                timing += timings.signed()
+                glider_list.append((lane, timing))
+
+            glider_lists.append(glider_list)
+
+        transform = (x, y) + MATRICES[n % 8]
+
+        yield (input_code, codes[output], n // 8, glider_lists, transform)
+
+# The dictionary of apgcodes, front coded
+def encode_codes(out, codes):
+
+    put_varint(out, len(codes))
+    last = ""
+
+    for code in codes:
+
+        shared = 0
+        while (shared < min(len(code), len(last)) and
+               code[shared] == last[shared]):
+            shared += 1
+
+        rest = code[shared:].encode("ascii")
+        put_varint(out, shared)
+        put_varint(out, len(rest))
+        out += rest
+        last = code
+
+def decode_codes(reader):
+
+    codes = []
+    last = ""
+
+    for _ in range(reader.varint()):
+        shared = reader.varint()
+        last = last[:shared] + reader.bytes(reader.varint()).decode("ascii")
+        codes.append(str(last))
+
+    return codes
+
+# Write an archive of all the edges in the given files
+def pack(archive, filenames):
+
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(archive)))
+
+    try:
+        # Sort by output and drop duplicates, without holding the edges
+        merged = external_sort(filenames, directory)
+
+        codes = set()
+        with open(merged) as f:
+            for s in f:
+                codes.update(s.split(";", 2)[:2])
+
+        codes = sorted(codes)
+        ids = dict((code, i) for i, code in enumerate(codes))
+
+        index = []
+        temp = archive + ".tmp"
+
+        with open(temp, "wb") as out, open(merged) as f:
+
+            out.write(MAGIC)
+            block = []
+
+            def flush():
+                data = encode_block(block, ids)
+                index.append((ids[block[0][1]], ids[block[-1][1]],
+                              out.tell(), len(data), len(block)))
+                out.write(data)
+
+            for s in f:
+                block.append(edge_from_string(s))
+                if len(block) == BLOCK_SIZE:
+                    flush()
+                    block = []
+
+            if block:
+                flush()
+
+            footer = bytearray()
+            encode_codes(footer, codes)
+            put_varint(footer, len(index))
+            for entry in index:
+                for n in entry:
+                    put_varint(footer, n)
+
+            footer = zlib.compress(bytes(footer), 9)
+            offset = out.tell()
+            out.write(footer)
+            out.write(struct.pack("<QQ", offset, len(footer)))
+
+        if os.path.exists(archive):
+            os.remove(archive)
+        os.rename(temp, archive)
+
+    finally:
+        shutil.rmtree(directory)
+
+    return sum(entry[4] for entry in index)
+
+class EdgeArchive(object):
+
+    def __init__(self, filename):
+
+        self.f = open(filename, "rb")
+
+        if self.f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not an edge archive" % filename)
+
+        self.f.seek(-16, 2)
+        offset, length = struct.unpack("<QQ", self.f.read(16))
+
+        self.f.seek(offset)
+        reader = Reader(bytearray(zlib.decompress(self.f.read(length))))
+
+        self.codes = decode_codes(reader)
+        self.ids = dict((code, i) for i, code in enumerate(self.codes))
+
+        self.index = [tuple(reader.varint() for _ in range(5))
+                      for _ in range(reader.varint())]
+        self.last_ids = [entry[1] for entry in self.index]
+
+    def close(self):
+        self.f.close()
+
+    def __len__(self):
+        return sum(entry[4] for entry in self.index)
+
+    def block(self, i):
+
+        _, _, offset, length, _ = self.index[i]
+
+        self.f.seek(offset)
+        return decode_block(self.f.read(length), self.codes)
+
+    # Stream every edge in the archive, in order of output apgcode
+    def __iter__(self):
+        for i in range(len(self.index)):
+            for edge in self.block(i):
+                yield edge
+
+    # All edges with the given output, reading only the blocks that can
+    # contain them
+    def edges_for(self, apgcode):
+
+        output = self.ids.get(apgcode)
+
+        if output is None:
+            return []
+
+        edges = []
+        i = bisect.bisect_left(self.last_ids, output)
+
+        while i < len(self.index) and self.index[i][0] <= output:
+            edges.extend(e for e in self.block(i) if e[1] == apgcode)
+            i += 1
+
+        return edges
+
+def main(args):
+
+    if len(args) < 2:
+        print("usage: python edge_archive.py pack ARCHIVE EDGE_FILE ... | "
+              "unpack ARCHIVE | get ARCHIVE APGCODE ...")
+        return 1
+
+    command, archive, args = args[0], args[1], args[2:]
+
+    if command == "pack":
+        print(pack(archive, args), "edges")
+        return 0
+
+    reader = EdgeArchive(archive)
+
+    if command == "unpack":
+        for edge in reader:
+            print(edge_to_string(edge))
+    elif command == "get":
+        for apgcode in args:
+            for edge in reader.edges_for(apgcode):
+                print(edge_to_string(edge))
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    reader.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
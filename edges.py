@@ -0,0 +1,127 @@
+# Helpers for reading and writing glider synthesis edges in the 8-field
+# format described in README.md. None of these need Golly, so they can be
+# used from command line tools as well as from Golly scripts.
+
+def edge_cost(edge):
+
+    _, _, _, glider_lists, _ = edge
+    return sum(len(l) for l in glider_lists)
+
+def edge_from_string(s):
+
+    t = s.strip().split(";")
+
+    glider_lists = []
+    for gliders_string in t[3:7]:
+        glider_list = []
+        if gliders_string:
+            gs = gliders_string.split(",")
+            for i in range(0, len(gs), 2):
+                glider_list.append((int(gs[i]), int(gs[i+1])))
+        glider_lists.append(glider_list)
+
+    transform = tuple(map(int, t[7].split(",")))
+
+    return (t[0], t[1], int(t[2]), glider_lists, transform)
+
+def edge_to_string(edge):
+
+    input_code, output_code, phase, glider_lists, transform = edge
+
+    fields = [input_code, output_code, str(phase)]
+
+    for glider_list in glider_lists:
+        fields.append(",".join("%d,%d" % pair for pair in glider_list))
+
+    fields.append(",".join(map(str, transform)))
+
+    return ";".join(fields)
+
+# Transforms are tuples (x0, y0, a, b, c, d) taking (x, y) to
+# (x0 + a * x + b * y, y0 + c * x + d * y), as in golly.transform
+
+# return the transformation t2 o t1
+def compose(t1, t2):
+
+    x1, y1, a1, b1, c1, d1 = t1
+    x2, y2, a2, b2, c2, d2 = t2
+
+    return (x2 + a2 * x1 + b2 * y1, y2 + c2 * x1 + d2 * y1,
+            a2 * a1 + b2 * c1, a2 * b1 + b2 * d1,
+            c2 * a1 + d2 * c1, c2 * b1 + d2 * d1)
+
+# return the inverse of t
+def inverse(t):
+
+    x, y, a, b, c, d = t
+
+    det = a * d - b * c
+
+    a, b, c, d = [det * i for i in [d, -b, -c, a]]
+
+    return (-a * x - b * y, -c * x - d * y, a, b, c, d)
+
+# Iterate over all edges in a file, skipping blank lines
+def read_edges(filename):
+
+    with open(filename) as f:
+        for s in f:
+            if s.strip():
+                yield edge_from_string(s)
+
+# Read a min_paths file into a dictionary keyed by output apgcode
+def read_min_paths(filename="min_paths.txt"):
+
+    min_paths = {}
+
+    for edge in read_edges(filename):
+        min_paths[edge[1]] = edge
+
+    return min_paths
+
+# Total glider cost of the chain from "0" to every object in min_paths.
+# Objects whose chain is broken (missing input or a loop) get None.
+def chain_costs(min_paths):
+
+    costs = {"0": 0}
+
+    for apgcode in min_paths:
+
+        chain = []
+        code = apgcode
+
+        while code not in costs:
+            if code not in min_paths or code in chain:
+                break
+            chain.append(code)
+            code = min_paths[code][0]
+
+        cost = costs.get(code)
+
+        for code in reversed(chain):
+            if cost is not None:
+                cost += edge_cost(min_paths[code])
+            costs[code] = cost
+
+    del costs["0"]
+    return costs
+
+# Read edge files into a graph: for each input apgcode, a dictionary from
+# output apgcode to the cheapest edge between the two
+def read_edge_graph(filenames):
+
+    graph = {}
+
+    for filename in filenames:
+        for edge in read_edges(filename):
+
+            if edge[0] == edge[1]:
+                continue
+
+            outputs = graph.setdefault(edge[0], {})
+            old = outputs.get(edge[1])
+
+            if old is None or edge_cost(edge) < edge_cost(old):
+                outputs[edge[1]] = edge
+
+    return graph
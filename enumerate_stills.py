@@ -0,0 +1,407 @@
+# enumerate_stills.py
+#
+# Enumerate every strict still life of up to N cells, to regenerate
+# translate17.txt.gz and the still lists and to extend them past 17
+# cells.
+#
+# Still lifes are searched for a row at a time inside a bounding box of
+# each width in turn. A row is only added if it leaves every cell of the
+# row above it (and the dead cells just outside the box) stable, so each
+# cell is checked as soon as its whole neighbourhood is known. The rows
+# that can follow a given pair of rows depend on nothing else, so they
+# are worked out once per pair and kept sorted by population, and the
+# search stops trying them as soon as they would take it over N cells. A
+# pattern ends with two empty rows (nothing can reach across them) and
+# is kept if it touches both sides of the box.
+#
+# Every still life is found once for each orientation whose bounding box
+# is at least as tall as it is wide (only those widths are searched).
+# Instead of keeping a set of everything seen, each one is only kept in
+# the orientation that comes first of those, so the workers never need
+# to compare results. Pseudo still lifes are dropped by trying every way
+# to split their islands (the pieces connected through diagonal or
+# orthogonal neighbours) into two groups that are each still.
+#
+# The work is shared out between processes by width and first row. The
+# apgcodes come from apgcode.canonise_many, which gives the same ones as
+# canonise in canonv11.py.
+#
+# Usage:
+#   python enumerate_stills.py N [--out DIRECTORY] [--workers N]
+#
+# DIRECTORY (default stills) gets translateN.txt.gz, in the format of
+# translate17.txt.gz, and the still lists still45678.txt and still09.txt
+# up to stillN.txt, with costs from min_paths.txt ("-" for none). Objects
+# in the object table keep their Niemiec IDs, new ones are numbered after
+# the existing IDs of the same size in apgcode order.
+
+from __future__ import print_function
+
+import gzip
+import multiprocessing
+import os
+import sys
+import time
+
+from apgcode import canonise_many
+from edges import chain_costs, read_min_paths
+from object_table import ObjectTable, niemiec_key
+
+OUTPUT = "stills"
+
+# Smallest number of cells enumerated, the block and tub have 4
+MIN_CELLS = 4
+
+# Whether the middle cell of a 3 by 3 window is stable: bits 0-2 are the
+# row above, 3-5 the middle row and 6-8 the row below
+VALID = []
+for window in range(512):
+    neighbours = bin(window & ~16).count("1")
+    VALID.append(neighbours in (2, 3) if window & 16 else neighbours != 3)
+
+# Values of the new bit of the row below for which the middle cell of the
+# window is stable, indexed by the row above's 3 bits, the middle row's 3
+# bits and the row below's first 2 bits
+NEXT_BITS = []
+for window in range(256):
+    NEXT_BITS.append(tuple(bit for bit in (0, 1)
+                           if VALID[window | (bit << 8)]))
+
+# Rows are ints with the cell in column x at bit x + 2, so that the cells
+# just outside the box at bits 1 and width + 2 can be checked as well
+OFFSET = 2
+
+# The widths to search for still lifes of up to limit cells. The short
+# side of the bounding box of a still life of n cells is at most n - 3
+# for n >= 8 (the diagonal chains), and at most n - 1 below that.
+def widths(limit):
+    return range(2, max(limit - 3, min(limit - 1, 4)) + 1)
+
+# The rows that can follow rows a and b in a box of the given width, as a
+# sorted list of (population, row)
+def next_rows(a, b, width, cache):
+
+    key = (a, b)
+    if key in cache:
+        return cache[key]
+
+    rows = [0]
+
+    for p in range(OFFSET, width + OFFSET):
+        s = p - 2
+        base = ((a >> s) & 7) | (((b >> s) & 7) << 3)
+        rows = [r | (bit << p) for r in rows
+                for bit in NEXT_BITS[base | (((r >> s) & 3) << 6)]]
+
+    # The last cell of the box and the one just outside it
+    ends = []
+    for r in rows:
+        for s in (width, width + 1):
+            if not VALID[((a >> s) & 7) | (((b >> s) & 7) << 3) |
+                         (((r >> s) & 7) << 6)]:
+                break
+        else:
+            ends.append((bin(r).count("1"), r))
+
+    ends.sort()
+    cache[key] = ends
+    return ends
+
+# Iterate over the still lifes (strict or not) of at most limit cells
+# whose bounding box is exactly width wide, at least as tall and whose
+# first row is first, as lists of rows
+def search_rows(width, first, limit, cache):
+
+    edges = (1 << OFFSET) | (1 << (width + OFFSET - 1))
+    population = bin(first).count("1")
+
+    # (row above, row, cells so far, index of the next row to try)
+    rows = [first]
+    union = [first]
+    stack = [(0, first, population, 0)]
+
+    while stack:
+
+        a, b, population, i = stack.pop()
+        options = next_rows(a, b, width, cache)
+
+        if i >= len(options) or options[i][0] > limit - population:
+            rows.pop()
+            union.pop()
+            continue
+
+        stack.append((a, b, population, i + 1))
+        count, r = options[i]
+
+        if r == 0 and b == 0:
+            continue
+
+        if r == 0 and union[-1] & edges == edges and len(rows) >= width:
+            # The pattern can end here if nothing is born in the row below
+            if next_rows(b, 0, width, cache)[0] == (0, 0):
+                yield list(rows)
+
+        rows.append(r)
+        union.append(union[-1] | r)
+        stack.append((b, r, population + count, 0))
+
+# Flat cell list of a list of rows, without the trailing empty rows
+def rows_to_cells(rows):
+
+    cells = []
+
+    for y, row in enumerate(rows):
+        x = 0
+        while row:
+            if row & (1 << OFFSET):
+                cells += [x, y]
+            row >>= 1
+            x += 1
+
+    return cells
+
+def neighbours(x, y):
+    return [(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            if dx or dy]
+
+# Whether a set of (x, y) cells is a still life
+def is_still(cells):
+
+    counts = {}
+    for x, y in cells:
+        for n in neighbours(x, y):
+            counts[n] = counts.get(n, 0) + 1
+
+    for cell, count in counts.items():
+        if count == 3 and cell not in cells:
+            return False
+
+    return all(counts.get(cell, 0) in (2, 3) for cell in cells)
+
+# The islands of a set of (x, y) cells: its pieces that are connected,
+# counting diagonal neighbours, as a list of sets
+def islands(cells):
+
+    left = set(cells)
+    result = []
+
+    while left:
+
+        island = set([left.pop()])
+        stack = list(island)
+
+        while stack:
+            for n in neighbours(*stack.pop()):
+                if n in left:
+                    left.remove(n)
+                    island.add(n)
+                    stack.append(n)
+
+        result.append(island)
+
+    return result
+
+# Whether a still life (a set of (x, y) cells) is strict, ie. its islands
+# can't be split into two groups that are still lifes on their own
+def is_strict(cells):
+
+    parts = islands(cells)
+
+    # The first island is always in the first group
+    for mask in range(1 << (len(parts) - 1)):
+
+        group = set(parts[0])
+        for i, part in enumerate(parts[1:]):
+            if mask >> i & 1:
+                group |= part
+
+        if len(group) < len(cells) and is_still(group) and \
+           is_still(cells - group):
+            return False
+
+    return True
+
+# The cells moved so that the bounding box starts at 0, 0, sorted
+def normalise(cells):
+
+    x0 = min(x for x, _ in cells)
+    y0 = min(y for _, y in cells)
+
+    return tuple(sorted((x - x0, y - y0) for x, y in cells))
+
+# Whether this is the orientation of a set of cells that the search keeps:
+# the first, in sorted order, of the ones at least as tall as they are wide
+def is_canonical(cells):
+
+    form = normalise(cells)
+    width = max(x for x, _ in form) + 1
+    height = max(y for _, y in form) + 1
+
+    for a, b, c, d in [(1, 0, 0, 1), (-1, 0, 0, 1), (1, 0, 0, -1),
+                       (-1, 0, 0, -1), (0, 1, 1, 0), (0, -1, 1, 0),
+                       (0, 1, -1, 0), (0, -1, -1, 0)]:
+
+        # Transposed orientations swap the width and height
+        if b and width < height:
+            continue
+
+        if normalise([(a * x + b * y, c * x + d * y) for x, y in form]) < form:
+            return False
+
+    return True
+
+# The strict still lifes found in one task, as flat cell lists
+def search_task(task):
+
+    width, first, limit = task
+
+    cache = search_task.caches.setdefault(width, {})
+    found = []
+
+    for rows in search_rows(width, first, limit, cache):
+
+        flat = rows_to_cells(rows)
+        cells = set(zip(flat[::2], flat[1::2]))
+
+        if len(cells) >= MIN_CELLS and is_canonical(cells) and is_strict(cells):
+            found.append(flat)
+
+    return found
+
+# Each worker process keeps the rows worked out for each width
+search_task.caches = {}
+
+# The tasks for still lifes of up to limit cells: one per width and
+# first row, widest first since those take longest
+def make_tasks(limit):
+
+    tasks = []
+
+    for width in reversed(widths(limit)):
+        for count, first in next_rows(0, 0, width, {}):
+            if 0 < count <= limit:
+                tasks.append((width, first, limit))
+
+    return tasks
+
+# All strict still lifes of up to limit cells, as a dictionary from
+# number of cells to a sorted list of apgcodes
+def enumerate_stills(limit, workers=None):
+
+    tasks = make_tasks(limit)
+    patterns = []
+
+    if workers == 1:
+        for task in tasks:
+            patterns += search_task(task)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            for found in pool.imap_unordered(search_task, tasks):
+                patterns += found
+        finally:
+            pool.close()
+            pool.join()
+
+    stills = {}
+
+    for apgcode, cells in zip(canonise_many(patterns), patterns):
+        stills.setdefault(len(cells) // 2, []).append(apgcode)
+
+    for bits in stills:
+        stills[bits].sort()
+
+    return stills
+
+# Niemiec IDs for every apgcode: the ones the object table knows, and
+# the rest numbered after them for each size
+def assign_ids(stills, table):
+
+    ids = {}
+
+    for bits, codes in stills.items():
+
+        known = [table.by_apgcode(code) for code in codes]
+        used = [int(row.niemiec.split(".")[1]) for row in known
+                if row is not None and row.niemiec.startswith("%d." % bits)]
+
+        n = max(used + [0])
+
+        for code, row in zip(codes, known):
+            if row is not None and row.niemiec.startswith("%d." % bits):
+                ids[code] = row.niemiec
+            else:
+                n += 1
+                ids[code] = "%d.%d" % (bits, n)
+
+    return ids
+
+def write_stills(stills, directory=OUTPUT, paths_file="min_paths.txt"):
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    ids = assign_ids(stills, ObjectTable.load())
+    costs = chain_costs(read_min_paths(paths_file))
+    limit = max(stills)
+
+    codes = sorted(ids, key=lambda code: niemiec_key(ids[code]))
+
+    translate = os.path.join(directory, "translate%d.txt.gz" % limit)
+    with gzip.open(translate, "wb") as f:
+        for code in codes:
+            f.write(("%s %s\n" % (ids[code], code)).encode("ascii"))
+
+    # As in the still lists: most expensive first
+    def cost_key(code):
+        cost = costs.get(code)
+        return (-1 if cost is None else -cost, niemiec_key(ids[code]))
+
+    groups = [("still45678.txt", range(MIN_CELLS, 9))]
+    groups += [("still%02d.txt" % bits, [bits]) for bits in range(9, limit + 1)]
+
+    for filename, sizes in groups:
+
+        group = sorted((code for bits in sizes for code in stills.get(bits, [])),
+                       key=cost_key)
+
+        if not group:
+            continue
+
+        with open(os.path.join(directory, filename), "w") as f:
+            for code in group:
+                cost = costs.get(code)
+                f.write("%-10s %-24s %s\n" % (ids[code], code,
+                                              "-" if cost is None else cost))
+
+def main(args):
+
+    if not args:
+        print("usage: python enumerate_stills.py N [--out DIRECTORY] "
+              "[--workers N]")
+        return 1
+
+    options = {"--out": OUTPUT, "--workers": None}
+
+    for name in list(options):
+        if name in args:
+            i = args.index(name)
+            options[name] = args[i+1]
+            args = args[:i] + args[i+2:]
+
+    limit = int(args[0])
+    workers = options["--workers"] and int(options["--workers"])
+
+    start = time.time()
+    stills = enumerate_stills(limit, workers)
+
+    for bits in sorted(stills):
+        print("%d cells: %d still lifes" % (bits, len(stills[bits])))
+
+    write_stills(stills, options["--out"])
+    print("Written to %s in %.1fs" % (options["--out"], time.time() - start))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
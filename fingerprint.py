@@ -0,0 +1,86 @@
+# fingerprint.py
+#
+# Compact fingerprints of sets of cells, for dedup and as keys for
+# shapes seen in any position.
+#
+# A fingerprint is a pair of polynomial hashes modulo the prime 2**61 - 1,
+# packed into one 122-bit integer (16 bytes). Each live cell (x, y)
+# contributes A**x * B**y to each hash, so translating a set by (dx, dy)
+# multiplies the hash by A**dx * B**dy, and dividing out the top left
+# corner of the bounding box gives a fingerprint that does not depend on
+# position.
+
+P = (1 << 61) - 1
+
+# Two independent (A, B) pairs
+BASES = [(0x1f3a5c9d2b4e6f01 % P, 0x2c4e6a8b0d1f3579 % P),
+         (0x3d5f7a9c1e2b4d6f % P, 0x0a2c4e6f8b1d3f57 % P)]
+
+# Cache of powers of the bases, keyed by (base, exponent)
+_powers = {}
+
+def power(base, exponent):
+
+    k = (base, exponent)
+
+    try:
+        return _powers[k]
+    except KeyError:
+        # Negative exponents via Fermat's little theorem
+        value = _powers[k] = pow(base, exponent % (P - 1), P)
+        return value
+
+def term(i, x, y):
+    a, b = BASES[i]
+    return power(a, x) * power(b, y) % P
+
+class Fingerprint(object):
+
+    __slots__ = ["h1", "h2"]
+
+    # Start from a flat cell list [x0, y0, x1, y1, ...]
+    def __init__(self, cells=()):
+
+        self.h1 = self.h2 = 0
+
+        for i in range(0, len(cells) - 1, 2):
+            self.add(cells[i], cells[i+1])
+
+    # Account for a cell becoming alive
+    def add(self, x, y):
+        self.h1 = (self.h1 + term(0, x, y)) % P
+        self.h2 = (self.h2 + term(1, x, y)) % P
+
+    # The position dependent fingerprint
+    def value(self):
+        return (self.h1 << 61) | self.h2
+
+    # The fingerprint of the same cells moved so that (min_x, min_y) is at
+    # the origin
+    def normalised(self, min_x, min_y):
+
+        h1 = self.h1 * term(0, -min_x, -min_y) % P
+        h2 = self.h2 * term(1, -min_x, -min_y) % P
+
+        return (h1 << 61) | h2
+
+    def __eq__(self, other):
+        return self.h1 == other.h1 and self.h2 == other.h2
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.value())
+
+# Position dependent fingerprint of a flat cell list
+def fingerprint(cells):
+    return Fingerprint(cells).value()
+
+# Fingerprint of a flat cell list that ignores translation
+def normalised_fingerprint(cells):
+
+    if not cells:
+        return 0
+
+    return Fingerprint(cells).normalised(min(cells[::2]), min(cells[1::2]))
@@ -0,0 +1,302 @@
+# kpaths.py
+#
+# The k cheapest synthesis chains for every object, over the full graph of
+# known edges rather than just the single edge per object kept in
+# min_paths.txt.
+#
+# A chain is a loopless path of edges from "0" to the object and its cost
+# is the sum of edge_cost over its edges. Where several edges join the same
+# pair of objects only the cheapest is used.
+#
+# build computes the k cheapest chains of every object in one pass with a
+# label setting search: each object accepts the first k chains to reach it
+# in order of cost, and only accepted chains are extended. Chains that
+# would visit an object twice are dropped.
+#
+# On its own that can miss a chain: when a prefix of it reaches an object
+# that already has k cheaper chains, all of which loop back through the
+# rest of it. That can only happen at an object on a cycle of the graph
+# that turned chains away, so the objects reachable from those are done
+# again with Yen's algorithm, which is exact. The per-object queries use
+# Yen's algorithm too.
+#
+# Usage:
+#   python kpaths.py build [K] [--edges FILE ...]   write k_paths.txt
+#   python kpaths.py show APGCODE                   print stored chains
+#   python kpaths.py best APGCODE K [--edges FILE ...]
+#   python kpaths.py avoid APGCODE CODE [CODE ...] [--edges FILE ...]
+#
+# Edge files default to min_paths.txt. k_paths.txt has one line per chain:
+#
+#   apgcode rank cost 0,code1,code2,...,apgcode
+
+from __future__ import print_function
+
+import heapq
+import sys
+
+from edges import edge_cost, edge_to_string, read_edge_graph
+
+K_PATHS = "k_paths.txt"
+
+DEFAULT_K = 5
+
+# Compute the k cheapest chains of every object. Returns a dictionary from
+# apgcode to a list of (cost, path) pairs, cheapest first, where each path
+# is a tuple of apgcodes starting with "0".
+def k_best_paths(graph, k=DEFAULT_K):
+
+    paths = {}
+    heap = [(0, 1, ("0",))]
+
+    # Objects that turned a chain away because they had k already
+    full = set()
+
+    while heap:
+
+        cost, length, path = heapq.heappop(heap)
+        node = path[-1]
+
+        found = paths.setdefault(node, [])
+        if len(found) >= k:
+            full.add(node)
+            continue
+
+        found.append((cost, path))
+
+        for output, edge in graph.get(node, {}).items():
+
+            if output in path:
+                continue
+
+            if len(paths.get(output, ())) >= k:
+                full.add(output)
+                continue
+
+            heapq.heappush(heap, (cost + edge_cost(edge), length + 1,
+                                  path + (output,)))
+
+    del paths["0"]
+
+    for target in reachable(graph, full & cyclic_nodes(graph)):
+        if target != "0":
+            paths[target] = k_shortest_paths(graph, target, k)
+
+    return paths
+
+# The objects that can be reached from any of sources, including sources
+def reachable(graph, sources):
+
+    seen = set(sources)
+    stack = list(seen)
+
+    while stack:
+        for output in graph.get(stack.pop(), {}):
+            if output not in seen:
+                seen.add(output)
+                stack.append(output)
+
+    return seen
+
+# The objects that lie on a cycle, ie. in a strongly connected component of
+# more than one object (edges from an object to itself are never read).
+# This is Tarjan's algorithm, with an explicit stack.
+def cyclic_nodes(graph):
+
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    cyclic = set()
+
+    for root in list(graph):
+
+        if root in index:
+            continue
+
+        work = [(root, iter(graph.get(root, {})))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+
+            node, outputs = work[-1]
+
+            for output in outputs:
+                if output not in index:
+                    index[output] = low[output] = len(index)
+                    stack.append(output)
+                    on_stack.add(output)
+                    work.append((output, iter(graph.get(output, {}))))
+                    break
+                if output in on_stack:
+                    low[node] = min(low[node], index[output])
+            else:
+                work.pop()
+
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cyclic.update(component)
+
+    return cyclic
+
+# Cheapest chain to target using Dijkstra's algorithm, never visiting the
+# objects in avoid or using the (input, output) pairs in banned. Returns
+# (cost, path) or None.
+def cheapest_path(graph, target, avoid=(), banned=(), start=("0",), start_cost=0):
+
+    avoid = set(avoid)
+    banned = set(banned)
+
+    heap = [(start_cost, len(start), start)]
+    settled = set(start[:-1])
+
+    while heap:
+
+        cost, length, path = heapq.heappop(heap)
+        node = path[-1]
+
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node == target:
+            return cost, path
+
+        for output, edge in graph.get(node, {}).items():
+            if (output not in settled and output not in avoid and
+                (node, output) not in banned):
+                heapq.heappush(heap, (cost + edge_cost(edge), length + 1,
+                                      path + (output,)))
+
+    return None
+
+def path_cost(graph, path):
+    return sum(edge_cost(graph[a][b]) for a, b in zip(path, path[1:]))
+
+# The k cheapest loopless chains to target by Yen's algorithm, avoiding the
+# objects in avoid
+def k_shortest_paths(graph, target, k=DEFAULT_K, avoid=()):
+
+    best = cheapest_path(graph, target, avoid)
+
+    if best is None:
+        return []
+
+    paths = [best]
+    candidates = []
+    seen = set([best[1]])
+
+    while len(paths) < k:
+
+        _, last = paths[-1]
+
+        # Branch off the last chain found at every object along it
+        for i in range(len(last) - 1):
+
+            root = last[:i+1]
+
+            banned = set((p[i], p[i+1]) for _, p in paths
+                         if len(p) > i + 1 and p[:i+1] == root)
+
+            spur = cheapest_path(graph, target, avoid, banned, root,
+                                 path_cost(graph, root))
+
+            if spur is not None and spur[1] not in seen:
+                seen.add(spur[1])
+                heapq.heappush(candidates, (spur[0], len(spur[1]), spur[1]))
+
+        if not candidates:
+            break
+
+        cost, _, path = heapq.heappop(candidates)
+        paths.append((cost, path))
+
+    return paths
+
+def write_k_paths(paths, filename=K_PATHS):
+
+    with open(filename, "w") as f:
+        for apgcode in sorted(paths):
+            for rank, (cost, path) in enumerate(paths[apgcode]):
+                f.write("%s %d %d %s\n" % (apgcode, rank + 1, cost,
+                                           ",".join(path)))
+
+def read_k_paths(filename=K_PATHS):
+
+    paths = {}
+
+    with open(filename) as f:
+        for s in f:
+            apgcode, rank, cost, path = s.split()
+            paths.setdefault(apgcode, []).append(
+                (int(cost), tuple(path.split(","))))
+
+    return paths
+
+def print_chain(graph, cost, path):
+
+    print("Cost %d gliders" % cost)
+
+    for a, b in zip(path, path[1:]):
+        print(edge_to_string(graph[a][b]))
+
+def main(args):
+
+    if not args:
+        print("usage: python kpaths.py build [K] | show APGCODE | "
+              "best APGCODE K | avoid APGCODE CODE ... [--edges FILE ...]")
+        return 1
+
+    edge_files = ["min_paths.txt"]
+
+    if "--edges" in args:
+        i = args.index("--edges")
+        args, edge_files = args[:i], args[i+1:]
+
+    command, args = args[0], args[1:]
+
+    if command == "show":
+        for cost, path in read_k_paths().get(args[0], []):
+            print(cost, ",".join(path))
+        return 0
+
+    graph = read_edge_graph(edge_files)
+
+    if command == "build":
+        paths = k_best_paths(graph, int(args[0]) if args else DEFAULT_K)
+        write_k_paths(paths)
+        print(len(paths), "objects")
+
+    elif command == "best":
+        for cost, path in k_shortest_paths(graph, args[0], int(args[1])):
+            print_chain(graph, cost, path)
+
+    elif command == "avoid":
+        best = cheapest_path(graph, args[0], args[1:])
+        if best is None:
+            print("No synthesis of %s avoiding %s" % (args[0],
+                                                      " ".join(args[1:])))
+            return 1
+        print_chain(graph, *best)
+
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
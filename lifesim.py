@@ -0,0 +1,633 @@
+# lifesim.py
+#
+# A small pure-Python stand-in for the parts of Golly's scripting module
+# used by the scripts in this directory. It lets the canonicaliser run
+# without Golly, eg. in worker processes or from the command line:
+#
+#   try:
+#       import golly as g
+#   except ImportError:
+#       import lifesim as g
+#
+# Only the rules used here are supported: Life, LifeHistory (only states
+# 0, 1 and 2) and InfectLife. There is a single universe, as in Golly, and
+# the user interface functions do nothing.
+#
+# Cells are stored as integers x + y * 2**32 (the keys of cellset.py) so
+# that neighbours are found by adding a constant.
+
+import os
+from collections import Counter
+
+from cellset import WIDTH, CellSet, coords, key
+
+# This module defines its own open() to match Golly
+_open = open
+
+NEIGHBOURS = [-WIDTH - 1, -WIDTH, -WIDTH + 1, -1, 1,
+              WIDTH - 1, WIDTH, WIDTH + 1]
+
+RULES = ["Life", "LifeHistory", "InfectLife"]
+
+# One generation of Life on a set of keys
+def life_step(live):
+
+    counts = Counter(k + d for k in live for d in NEIGHBOURS)
+
+    return set(k for k, n in counts.items()
+               if n == 3 or (n == 2 and k in live))
+
+# Sparse runs
+#
+# Most of a long run is usually gliders flying through empty space, or
+# still lifes and blinkers sitting there after the reaction is over.
+# run_life takes isolated gliders out of the pattern and moves them in
+# closed form, and only steps the rest (the active cells), in epochs short
+# enough that nothing can reach a glider before the epoch ends. Patterns
+# spread at most one cell per generation and gliders move at most one
+# cell per four, so the gaps between bounding boxes bound each epoch. A
+# glider that is too close to something for an epoch of MIN_EPOCH
+# generations goes back into the active cells. Once the active cells
+# repeat with period 1 or 2 they are not stepped again until the epoch
+# ends.
+
+# The gliders of canonv11.py's GLIDERS in phase 0, with their velocities
+GLIDER_BASES = [([(0, 0), (1, 0), (2, 0), (2, 1), (1, 2)], (1, -1)),   #NE
+                ([(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)], (1, 1)),    #SE
+                ([(1, 0), (0, 1), (0, 2), (1, 2), (2, 2)], (-1, 1)),   #SW
+                ([(0, 0), (1, 0), (2, 0), (0, 1), (1, 2)], (-1, -1))]  #NW
+
+# Runs shorter than this are just stepped
+SPARSE_RUN = 32
+
+MIN_EPOCH = 8
+
+# Longest epoch while the active cells are still changing, so that gliders
+# they send out are soon taken out
+MAX_EPOCH = 64
+
+# Offsets to half of the cells within distance 2, so that each pair of
+# cells close enough to interact is looked at once
+CLUSTER_OFFSETS = [dx + dy * WIDTH for dy in range(3) for dx in range(-2, 3)
+                   if dy > 0 or dx > 0]
+
+# Cells of each glider in each phase, and a table from the shape of each
+# phase (moved to the origin) to (direction, phase, x, y) where (x, y) is
+# its top left corner
+def glider_tables():
+
+    phases = []
+    shapes = {}
+
+    for direction, (cells, _) in enumerate(GLIDER_BASES):
+
+        live = set(key(x, y) for x, y in cells)
+        phases.append([])
+
+        for phase in range(4):
+
+            pairs = [coords(k) for k in live]
+            min_x = min(x for x, _ in pairs)
+            min_y = min(y for _, y in pairs)
+
+            phases[-1].append(pairs)
+            shapes[frozenset((x - min_x, y - min_y) for x, y in pairs)] = (
+                direction, phase, min_x, min_y)
+
+            live = life_step(live)
+
+    return phases, shapes
+
+GLIDER_PHASES, GLIDER_SHAPES = glider_tables()
+
+# Groups of cells that are within distance 2 of each other. Cells in
+# different groups can't affect each other in the next generation.
+def clusters(live):
+
+    parent = dict((k, k) for k in live)
+
+    def find(k):
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    for k in live:
+        for d in CLUSTER_OFFSETS:
+            if k + d in live:
+                a, b = find(k), find(k + d)
+                if a != b:
+                    parent[a] = b
+
+    groups = {}
+    for k in live:
+        groups.setdefault(find(k), []).append(k)
+
+    return groups.values()
+
+def bounding_box(pairs):
+
+    xs = [x for x, _ in pairs]
+    ys = [y for _, y in pairs]
+
+    return min(xs), min(ys), max(xs), max(ys)
+
+# Chebyshev distance between the nearest cells of two bounding boxes
+def box_gap(a, b):
+    return max(b[0] - a[2], a[0] - b[2], b[1] - a[3], a[1] - b[3])
+
+# Longest epoch in which a glider and an active box this far apart can't
+# interact: the box can grow by E and the glider move by E // 4 + 1, and
+# they must stay 3 apart
+def active_epoch(gap):
+    return 4 * (gap - 4) // 5
+
+# The same for two gliders travelling in different directions
+def glider_epoch(gap):
+    return 4 * ((gap - 5) // 2)
+
+# A glider is a list [direction, phase, x, y]
+def glider_pairs(glider):
+
+    direction, phase, x, y = glider
+    return [(x + dx, y + dy) for dx, dy in GLIDER_PHASES[direction][phase]]
+
+def advance_glider(glider, n):
+
+    direction, phase, x, y = glider
+    vx, vy = GLIDER_BASES[direction][1]
+    cycles, phase = divmod(phase + n, 4)
+
+    return [direction, phase, x + cycles * vx, y + cycles * vy]
+
+# Take the isolated gliders out of the active cells and put back any
+# gliders that are too close to something. Returns the active cells, the
+# gliders and the longest epoch the gliders allow (None if no limit).
+def plan_epoch(active, gliders):
+
+    boxes = []
+
+    for group in clusters(active):
+
+        pairs = [coords(k) for k in group]
+        box = bounding_box(pairs)
+
+        if len(group) == 5:
+            shape = frozenset((x - box[0], y - box[1]) for x, y in pairs)
+            if shape in GLIDER_SHAPES:
+                direction, phase, min_x, min_y = GLIDER_SHAPES[shape]
+                gliders.append([direction, phase, box[0] - min_x,
+                                box[1] - min_y])
+                active.difference_update(group)
+                continue
+
+        boxes.append(box)
+
+    while True:
+
+        limit = None
+        merge = None
+        glider_boxes = [bounding_box(glider_pairs(gl)) for gl in gliders]
+
+        for i, glider in enumerate(gliders):
+
+            epochs = [active_epoch(box_gap(glider_boxes[i], box))
+                      for box in boxes]
+
+            for j, other in enumerate(gliders):
+                if i != j:
+                    gap = box_gap(glider_boxes[i], glider_boxes[j])
+                    # Gliders going the same way keep the same distance
+                    if other[0] != glider[0] or gap < 5:
+                        epochs.append(glider_epoch(gap))
+
+            epoch = min(epochs) if epochs else None
+
+            if epoch is not None and epoch < MIN_EPOCH:
+                merge = i
+                break
+
+            if epoch is not None and (limit is None or epoch < limit):
+                limit = epoch
+
+        if merge is None:
+            return active, gliders, limit
+
+        active.update(key(x, y) for x, y in glider_pairs(gliders[merge]))
+        boxes.append(glider_boxes[merge])
+        del gliders[merge]
+
+# Run a set of keys n generations in Life
+def run_life(live, n):
+
+    if n < SPARSE_RUN:
+        for _ in range(n):
+            live = life_step(live)
+        return live
+
+    active = set(live)
+    gliders = []
+    t = 0
+
+    while t < n:
+
+        active, gliders, limit = plan_epoch(active, gliders)
+        epoch = n - t if limit is None else min(n - t, limit)
+
+        before = None
+        i = 0
+
+        while i < epoch:
+
+            new = life_step(active)
+            i += 1
+
+            if new == active:
+                i = epoch
+            elif new == before:
+                if (epoch - i) % 2:
+                    new = active
+                i = epoch
+            elif i >= MAX_EPOCH:
+                epoch = i
+
+            before, active = active, new
+
+        gliders = [advance_glider(gl, epoch) for gl in gliders]
+        t += epoch
+
+    for glider in gliders:
+        active.update(key(x, y) for x, y in glider_pairs(glider))
+
+    return active
+
+# Spread an InfectLife infection until it stops. State 3 infects live (1)
+# and history (2) cells next to it. A dead cell next to a 3 with at least
+# two more live, history or infected neighbours becomes 4, which infects
+# its own neighbours and so carries the infection across small gaps.
+#
+# A cell can only change when a neighbour has just become infected, so
+# each generation only looks at the cells infected in the previous one.
+def infect(states, generations):
+
+    frontier = [k for k, s in states.items() if s >= 3]
+
+    for _ in range(generations):
+
+        changes = {}
+
+        for k in frontier:
+
+            infected = states[k] == 3
+
+            for d in NEIGHBOURS:
+
+                n = k + d
+                s = states.get(n, 0)
+
+                if s == 1 or s == 2:
+                    changes[n] = 3
+                elif s == 0 and infected and n not in changes:
+                    count = 0
+                    for e in NEIGHBOURS:
+                        if 0 < states.get(n + e, 0) < 4:
+                            count += 1
+                    if count >= 3:
+                        changes[n] = 4
+
+        if not changes:
+            break
+
+        states.update(changes)
+        frontier = list(changes)
+
+class Universe(object):
+
+    def __init__(self):
+
+        self.rule = "Life"
+        self.live = set()
+        # Non-Life states for LifeHistory and InfectLife
+        self.states = {}
+        self.base = 2
+        self.exponent = 0
+        self.generation = 0
+
+    def clear(self):
+        self.live = set()
+        self.states = {}
+        self.generation = 0
+
+    def setrule(self, rule):
+
+        rule = rule.split(":")[0]
+
+        if rule not in RULES:
+            raise ValueError("lifesim does not support rule %s" % rule)
+
+        old = self.rule
+
+        # Move cells between the two representations
+        if rule == "Life" and old != "Life":
+            self.live = set(k for k, s in self.states.items() if s == 1)
+            self.states = {}
+        elif rule != "Life" and old == "Life":
+            self.states = dict((k, 1) for k in self.live)
+            self.live = set()
+
+        self.rule = rule
+        return old
+
+    def getcell(self, x, y):
+
+        if self.rule == "Life":
+            return 1 if key(x, y) in self.live else 0
+
+        return self.states.get(key(x, y), 0)
+
+    def setcell(self, x, y, state):
+
+        k = key(x, y)
+
+        if self.rule == "Life":
+            if state:
+                self.live.add(k)
+            else:
+                self.live.discard(k)
+        elif state:
+            self.states[k] = state
+        else:
+            self.states.pop(k, None)
+
+    def keys(self):
+        return self.live if self.rule == "Life" else self.states.keys()
+
+    def run(self, n):
+
+        if self.rule == "Life":
+            self.live = run_life(self.live, n)
+
+        elif self.rule == "LifeHistory":
+            live = set(k for k, s in self.states.items() if s == 1)
+            history = set(k for k, s in self.states.items() if s == 2)
+            for _ in range(n):
+                new = life_step(live)
+                history |= live - new
+                live = new
+            history -= live
+            self.states = dict((k, 2) for k in history)
+            self.states.update((k, 1) for k in live)
+
+        else:
+            infect(self.states, n)
+
+        self.generation += n
+
+universe = Universe()
+
+# Convert a flat cell list into keys, with an optional transformation
+def list_keys(cells, x0=0, y0=0, a=1, b=0, c=0, d=1):
+
+    step = 3 if len(cells) % 2 else 2
+
+    for i in range(0, len(cells) - step + 1, step):
+        x, y = cells[i], cells[i+1]
+        state = cells[i+2] if step == 3 else 1
+        yield key(x0 + a * x + b * y, y0 + c * x + d * y), state
+
+# Keys in reading order (by y, then x), which is just their order as
+# numbers
+def sorted_keys(keys):
+    return sorted(keys)
+
+def new(title):
+    universe.clear()
+
+def setrule(rule):
+    return universe.setrule(rule)
+
+def getrule():
+    return universe.rule
+
+def setbase(base):
+    universe.base = base
+
+def setstep(exponent):
+    universe.exponent = exponent
+
+def step():
+    universe.run(universe.base ** universe.exponent)
+
+def run(n):
+    universe.run(n)
+
+def getgen():
+    return str(universe.generation)
+
+def getcell(x, y):
+    return universe.getcell(x, y)
+
+def setcell(x, y, state):
+    universe.setcell(x, y, state)
+
+def empty():
+    return not universe.keys()
+
+def getpop():
+    return str(len(universe.keys()))
+
+def getrect():
+
+    return CellSet.from_keys(universe.keys()).bounding_box()
+
+def getcells(rect):
+
+    if not rect:
+        return []
+
+    if universe.rule == "Life":
+        cells = CellSet.from_keys(sorted(universe.live))
+        if rect != cells.bounding_box():
+            cells = cells.clip(*rect)
+        return cells.tolist()
+
+    x0, y0, w, h = rect
+    cells = []
+
+    for k in sorted_keys(universe.keys()):
+        x, y = coords(k)
+        if x0 <= x < x0 + w and y0 <= y < y0 + h:
+            cells.append(x)
+            cells.append(y)
+            if universe.rule != "Life":
+                cells.append(universe.states[k])
+
+    # Golly pads multi-state cell lists to an odd length
+    if universe.rule != "Life" and len(cells) % 2 == 0 and cells:
+        cells.append(0)
+
+    return cells
+
+def putcells(cells, x0=0, y0=0, a=1, b=0, c=0, d=1, mode="or"):
+
+    if universe.rule == "Life" and mode == "or" and len(cells) % 2 == 0:
+        universe.live |= CellSet(cells).transform(x0, y0, a, b, c, d).keys()
+        return
+
+    for k, state in list_keys(cells, x0, y0, a, b, c, d):
+
+        x, y = coords(k)
+
+        if mode == "xor":
+            state = state ^ universe.getcell(x, y)
+        elif mode == "not":
+            state = 0 if state else 1
+
+        if state or mode in ["copy", "xor", "not"]:
+            universe.setcell(x, y, state)
+
+# Evolve a two state cell list in Life
+def evolve(cells, n):
+
+    live = run_life(CellSet(cells).keys(), n)
+
+    return CellSet.from_keys(sorted(live)).tolist()
+
+def transform(cells, x0, y0, a=1, b=0, c=0, d=1):
+
+    result = []
+
+    for i in range(0, len(cells) - 1, 2):
+        x, y = cells[i], cells[i+1]
+        result.append(x0 + a * x + b * y)
+        result.append(y0 + c * x + d * y)
+
+    return result
+
+def parse(rle, x0=0, y0=0, a=1, b=0, c=0, d=1):
+
+    cells = []
+    x = y = 0
+    count = ""
+
+    for ch in rle:
+
+        if ch.isdigit():
+            count += ch
+            continue
+
+        n = int(count) if count else 1
+        count = ""
+
+        if ch == "b" or ch == ".":
+            x += n
+        elif ch == "o" or ch == "A":
+            for _ in range(n):
+                cells.append(x)
+                cells.append(y)
+                x += 1
+        elif ch.isalpha():
+            # Other states are treated as dead
+            x += n
+        elif ch == "$":
+            x = 0
+            y += n
+        elif ch == "!":
+            break
+
+    return transform(cells, x0, y0, a, b, c, d)
+
+# Load an RLE file into the universe
+def open(filename, remember=False):
+
+    universe.clear()
+    universe.setrule("Life")
+
+    lines = []
+    with _open(filename) as f:
+        for s in f:
+            s = s.strip()
+            if not s or s.startswith("#") or s.startswith("x"):
+                continue
+            lines.append(s)
+
+    putcells(parse("".join(lines)))
+
+# Save the universe as an RLE file
+def save(filename, format="rle", remember=False):
+
+    rect = getrect()
+    cells = getcells(rect)
+
+    with _open(filename, "w") as f:
+        if not rect:
+            f.write("x = 0, y = 0, rule = B3/S23\n!\n")
+            return
+        x0, y0, w, h = rect
+        f.write("x = %d, y = %d, rule = B3/S23\n" % (w, h))
+        f.write(cells_to_rle(cells, x0, y0) + "\n")
+
+def cells_to_rle(cells, x0, y0):
+
+    rows = {}
+    for i in range(0, len(cells) - 1, 2):
+        rows.setdefault(cells[i+1] - y0, []).append(cells[i] - x0)
+
+    out = []
+    y = 0
+
+    for row in sorted(rows):
+
+        if row > y:
+            out.append("%d$" % (row - y) if row - y > 1 else "$")
+        y = row
+
+        x = 0
+        run_start = None
+        xs = sorted(rows[row])
+
+        for i, cx in enumerate(xs):
+            if run_start is None:
+                run_start = cx
+            if i + 1 < len(xs) and xs[i+1] == cx + 1:
+                continue
+            if run_start > x:
+                gap = run_start - x
+                out.append("%db" % gap if gap > 1 else "b")
+            length = cx - run_start + 1
+            out.append("%do" % length if length > 1 else "o")
+            x = cx + 1
+            run_start = None
+
+    out.append("!")
+
+    return "".join(out)
+
+def getdir(name):
+    return os.getcwd()
+
+# User interface functions have nothing to do
+def show(message):
+    pass
+
+def fit():
+    pass
+
+def update():
+    pass
+
+def select(rect):
+    pass
+
+def getselrect():
+    return []
+
+def copy():
+    pass
+
+def getkey():
+    return ""
+
+def exit(message=""):
+    raise SystemExit(message)
+
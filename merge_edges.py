@@ -0,0 +1,249 @@
+# merge_edges.py
+#
+# Merge any number of edge files into an improved min_paths.txt.
+#
+# The edges are sorted by output apgcode with an external merge sort, so
+# only RUN_SIZE lines are held in memory at a time whatever the size of
+# the input, and identical edges are dropped as the sorted runs are
+# merged. The optimal chain cost of every object is then found by
+# relaxing costs over the sorted file until nothing changes, with one
+# pass per level of the deepest chain. Only a cost per object is kept in
+# memory, never the edges.
+#
+# Costs are compared as (gliders, steps) so that chains never loop, even
+# through edges that cost no gliders. Where the current min_paths edge is
+# as good as any other it is kept.
+#
+# Usage:
+#   python merge_edges.py [--old min_paths.txt] [--out min_paths.txt]
+#                         [--changes changes.txt] EDGE_FILE ...
+#
+# The old file is always included in the merge. The changelog lists every
+# object whose cost went down, or which has a synthesis for the first
+# time, as "apgcode old_cost new_cost" with "-" for no previous cost.
+
+from __future__ import print_function
+
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+
+from edges import chain_costs, read_min_paths
+
+# Lines per sorted run
+RUN_SIZE = 500000
+
+# Glider cost of an edge straight from its string, without parsing it
+def line_cost(fields):
+    return sum(f.count(",") + 1 for f in fields[3:7] if f) // 2
+
+def sort_key(line):
+    return line.split(";", 2)[1], line
+
+def write_run(lines, directory):
+
+    lines.sort(key=sort_key)
+
+    f = tempfile.NamedTemporaryFile("w", dir=directory, delete=False)
+    with f:
+        f.writelines(lines)
+
+    return f.name
+
+# Sort all edges in the given files by output apgcode into a single file,
+# without duplicates. Returns the name of the sorted file.
+def external_sort(filenames, directory):
+
+    runs = []
+    lines = []
+
+    for filename in filenames:
+        with open(filename) as f:
+            for s in f:
+                s = s.strip()
+                if not s:
+                    continue
+                lines.append(s + "\n")
+                if len(lines) >= RUN_SIZE:
+                    runs.append(write_run(lines, directory))
+                    lines = []
+
+    if lines or not runs:
+        runs.append(write_run(lines, directory))
+
+    files = [open(run) for run in runs]
+
+    merged = os.path.join(directory, "merged.txt")
+    last = None
+
+    with open(merged, "w") as out:
+        for line in heapq.merge(*[((sort_key(s), s) for s in f) for f in files]):
+            if line[1] != last:
+                out.write(line[1])
+                last = line[1]
+
+    for f, run in zip(files, runs):
+        f.close()
+        os.remove(run)
+
+    return merged
+
+# Iterate over (output, [edge fields, ...]) groups of a sorted file
+def groups(filename):
+
+    with open(filename) as f:
+
+        output = None
+        group = []
+
+        for s in f:
+            fields = s.rstrip("\n").split(";")
+            if fields[1] != output:
+                if group:
+                    yield output, group
+                output = fields[1]
+                group = []
+            group.append(fields)
+
+        if group:
+            yield output, group
+
+# Find the best (gliders, steps) cost of every object by repeated passes
+def relax_costs(merged):
+
+    costs = {"0": (0, 0)}
+    changed = True
+    passes = 0
+
+    while changed:
+
+        changed = False
+        passes += 1
+
+        for output, group in groups(merged):
+            for fields in group:
+
+                if fields[0] not in costs:
+                    continue
+
+                gliders, steps = costs[fields[0]]
+                cost = (gliders + line_cost(fields), steps + 1)
+
+                if output not in costs or cost < costs[output]:
+                    costs[output] = cost
+                    changed = True
+
+    return costs, passes
+
+# Choose one optimal edge for every object, keeping the old edge if it is
+# one of the optimal ones
+def choose_edges(merged, costs, old_lines):
+
+    chosen = []
+
+    for output, group in groups(merged):
+
+        if output not in costs or output == "0":
+            continue
+
+        best = None
+
+        for fields in group:
+
+            if fields[0] not in costs:
+                continue
+
+            gliders, steps = costs[fields[0]]
+            if (gliders + line_cost(fields), steps + 1) != costs[output]:
+                continue
+
+            line = ";".join(fields)
+
+            if best is None or line in old_lines:
+                best = line
+                if line in old_lines:
+                    break
+
+        chosen.append(best + "\n")
+
+    chosen.sort()
+
+    return chosen
+
+def merge(filenames, old="min_paths.txt", out="min_paths.txt",
+          changes="changes.txt"):
+
+    old_paths = read_min_paths(old) if os.path.exists(old) else {}
+    old_costs = chain_costs(old_paths)
+
+    old_lines = set()
+    if os.path.exists(old):
+        with open(old) as f:
+            old_lines = set(s.strip() for s in f if s.strip())
+        filenames = [old] + list(filenames)
+
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(out)))
+
+    try:
+        merged = external_sort(filenames, directory)
+        costs, passes = relax_costs(merged)
+        chosen = choose_edges(merged, costs, old_lines)
+
+        temp = os.path.join(directory, "min_paths.txt")
+        with open(temp, "w") as f:
+            f.writelines(chosen)
+
+        if os.path.exists(out):
+            os.remove(out)
+        shutil.move(temp, out)
+
+    finally:
+        shutil.rmtree(directory)
+
+    improved = 0
+
+    with open(changes, "w") as f:
+        for apgcode in sorted(costs):
+
+            if apgcode == "0":
+                continue
+
+            new_cost = costs[apgcode][0]
+            old_cost = old_costs.get(apgcode)
+
+            if old_cost is None or new_cost < old_cost:
+                f.write("%s %s %d\n" % (apgcode, "-" if old_cost is None
+                                        else old_cost, new_cost))
+                improved += 1
+
+    return len(chosen), improved, passes
+
+def main(args):
+
+    options = {"--old": "min_paths.txt", "--out": "min_paths.txt",
+               "--changes": "changes.txt"}
+    filenames = []
+
+    while args:
+        if args[0] in options and len(args) > 1:
+            options[args[0]] = args[1]
+            args = args[2:]
+        else:
+            filenames.append(args[0])
+            args = args[1:]
+
+    if not filenames:
+        print("usage: python merge_edges.py [--old FILE] [--out FILE] "
+              "[--changes FILE] EDGE_FILE ...")
+        return 1
+
+    objects, improved, passes = merge(filenames, options["--old"],
+                                      options["--out"], options["--changes"])
+
+    print("%d objects, %d improved, %d passes" % (objects, improved, passes))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,255 @@
+# object_store.py
+#
+# A persistent store of what is known about each object: its period, its
+# cells in every phase and the envelope of the cells it ever occupies
+# over a full cycle. Entries are worked out the first time an object is
+# asked for and kept in an sqlite database, so common objects like xs4_33
+# or xp2_7 are only ever simulated once.
+#
+# Two kinds of entry are kept:
+#
+# * objects, keyed by apgcode, with the phases of decodeCanon(apgcode)
+#   and their envelope. Used to draw edges without evolving the output.
+#
+# * shapes, keyed by the normalised fingerprint (see fingerprint.py) of
+#   a pattern in whatever position, phase and orientation it was found,
+#   with its period and dimensions relative to its top left corner. This
+#   is what the canonicaliser needs from analyse_object, before it knows
+#   the pattern's apgcode.
+#
+# Only objects and shapes that turn out to be periodic are stored.
+#
+# Usage:
+#   python object_store.py show APGCODE ...
+#   python object_store.py count
+
+from __future__ import print_function
+
+import os
+import sqlite3
+import sys
+
+from apgcode import MAX_PERIOD, decodeCanon, find_phases
+from cellset import CellSet
+from fingerprint import normalised_fingerprint
+from lifesim import evolve
+
+DATABASE = "objects.db"
+
+SCHEMA = """
+create table if not exists objects (
+    apgcode text primary key,
+    period integer not null,
+    phases text not null,
+    envelope text not null
+);
+create table if not exists shapes (
+    fingerprint text primary key,
+    period integer not null,
+    dimensions text not null
+);
+"""
+
+def cells_to_string(cells):
+    return ",".join(map(str, cells))
+
+def string_to_cells(s):
+    return [int(n) for n in s.split(",")] if s else []
+
+def keys_to_cells(keys):
+    return CellSet.from_keys(sorted(keys)).tolist()
+
+# [min_x, min_y, max_x, max_y] of a set of keys
+def key_dimensions(keys):
+
+    if not keys:
+        return None
+
+    x0, y0, w, h = CellSet.from_keys(keys).bounding_box()
+    return [x0, y0, x0 + w - 1, y0 + h - 1]
+
+class ObjectInfo(object):
+
+    def __init__(self, period, phases, envelope):
+
+        self.period = period
+        self.phases = phases
+        self.envelope = envelope
+
+    # [min_x, min_y, max_x, max_y] over the full cycle, None if empty
+    def dimensions(self):
+
+        if not self.envelope:
+            return None
+
+        return [min(self.envelope[::2]), min(self.envelope[1::2]),
+                max(self.envelope[::2]), max(self.envelope[1::2])]
+
+    def phase_cells(self, phase):
+        return self.phases[phase % self.period]
+
+class ObjectStore(object):
+
+    def __init__(self, filename=DATABASE):
+
+        self.db = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+        self.objects = {}
+        self.shapes = {}
+
+    def close(self):
+        self.db.close()
+
+    # Everything known about an object, or None if decodeCanon(apgcode)
+    # isn't periodic
+    def get(self, apgcode):
+
+        if apgcode in self.objects:
+            return self.objects[apgcode]
+
+        row = self.db.execute("select period, phases, envelope from objects "
+                              "where apgcode = ?", (apgcode,)).fetchone()
+
+        if row is not None:
+            period, phases, envelope = row
+            info = ObjectInfo(period, [string_to_cells(s) for s in
+                                       phases.split(";")],
+                              string_to_cells(envelope))
+        else:
+            info = self.compute(apgcode)
+
+        self.objects[apgcode] = info
+        return info
+
+    def compute(self, apgcode):
+
+        period, phases = find_phases(decodeCanon(apgcode))
+
+        if period is None:
+            return None
+
+        envelope = set()
+        for keys in phases:
+            envelope.update(keys)
+
+        info = ObjectInfo(period, [keys_to_cells(keys) for keys in phases],
+                          keys_to_cells(envelope))
+
+        self.db.execute("insert or ignore into objects values (?, ?, ?, ?)",
+                        (apgcode, period,
+                         ";".join(map(cells_to_string, info.phases)),
+                         cells_to_string(info.envelope)))
+        return info
+
+    # Cells of an object advanced by phase generations. Anything that
+    # isn't periodic in place (eg. an xq spaceship) is evolved from
+    # decodeCanon(apgcode), which can only go forwards.
+    def phase_cells(self, apgcode, phase=0):
+
+        info = self.get(apgcode)
+
+        if info is not None:
+            return info.phase_cells(phase)
+
+        if phase < 0:
+            raise ValueError("%s can't be run backwards" % apgcode)
+
+        return evolve(decodeCanon(apgcode), phase)
+
+    # The period and dimensions of a flat cell list, as analyse_object
+    # returns them: (period, [min_x, min_y, max_x, max_y]) over the full
+    # cycle, (1, None) if empty, or (None, None) if the period is more
+    # than max_period.
+    def analyse(self, cells, max_period=MAX_PERIOD):
+
+        if not cells:
+            return 1, None
+
+        x0, y0 = min(cells[::2]), min(cells[1::2])
+        k = "%x" % normalised_fingerprint(cells)
+
+        if k not in self.shapes:
+
+            row = self.db.execute("select period, dimensions from shapes "
+                                  "where fingerprint = ?", (k,)).fetchone()
+
+            if row is not None:
+                self.shapes[k] = row[0], string_to_cells(row[1])
+            else:
+                self.shapes[k] = self.compute_shape(k, cells, x0, y0)
+
+        period, dimensions = self.shapes[k]
+
+        if period is None or period > max_period:
+            return None, None
+
+        return period, [dimensions[0] + x0, dimensions[1] + y0,
+                        dimensions[2] + x0, dimensions[3] + y0]
+
+    def compute_shape(self, k, cells, x0, y0):
+
+        period, phases = find_phases(cells)
+
+        if period is None:
+            return None, None
+
+        envelope = set()
+        for keys in phases:
+            envelope.update(keys)
+
+        min_x, min_y, max_x, max_y = key_dimensions(envelope)
+        dimensions = [min_x - x0, min_y - y0, max_x - x0, max_y - y0]
+
+        self.db.execute("insert or ignore into shapes values (?, ?, ?)",
+                        (k, period, cells_to_string(dimensions)))
+
+        return period, dimensions
+
+    def count(self):
+        return (self.db.execute("select count(*) from objects").fetchone()[0],
+                self.db.execute("select count(*) from shapes").fetchone()[0])
+
+# One store per process, opened on first use. sqlite connections can't be
+# shared with worker processes, so a forked worker opens its own.
+_store = None
+_store_pid = None
+
+def get_store():
+
+    global _store, _store_pid
+
+    if _store is None or _store_pid != os.getpid():
+        _store = ObjectStore()
+        _store_pid = os.getpid()
+
+    return _store
+
+def main(args):
+
+    if not args:
+        print("usage: python object_store.py show APGCODE ... | count")
+        return 1
+
+    store = get_store()
+
+    if args[0] == "count":
+        print("%d objects, %d shapes" % store.count())
+    elif args[0] == "show":
+        for apgcode in args[1:]:
+            info = store.get(apgcode)
+            if info is None:
+                print(apgcode, "is not a still life or oscillator")
+                continue
+            print(apgcode, "period", info.period,
+                  "dimensions", info.dimensions())
+            for phase in range(info.period):
+                print(" ", phase, cells_to_string(info.phase_cells(phase)))
+    else:
+        print("Unknown command %r" % args[0])
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
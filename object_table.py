@@ -0,0 +1,335 @@
+# object_table.py
+#
+# One indexed table of every object in the still-life and frequency lists.
+#
+# still_list.txt, summary.txt, still45678.txt, still09.txt .. still16.txt,
+# byfreq.txt and translate17.txt.gz all describe the same objects with
+# overlapping columns (Niemiec ID, apgcode, cost, frequency). They are
+# joined into a single table which is cached in a compact binary file,
+# objects.tbl, and rebuilt automatically whenever one of the text files is
+# newer than the cache.
+#
+# The cache holds each numeric column as a packed array and the strings as
+# newline separated blobs, so loading it is a handful of reads. Rows are
+# sorted by bit count, and a second order sorted by cost is stored too, so
+# both support range queries by bisection. Lookups by apgcode or Niemiec
+# ID go through dictionaries built at load time.
+#
+# Usage:
+#   python object_table.py CODE           look up an apgcode or Niemiec ID
+#   python object_table.py bits LO [HI]   objects with LO <= bits <= HI
+#   python object_table.py cost LO [HI]   objects with LO <= cost <= HI
+#   python object_table.py rebuild
+
+from __future__ import print_function
+
+import array
+import bisect
+import gzip
+import os
+import sys
+from collections import namedtuple
+
+TABLE = "objects.tbl"
+
+MAGIC = b"OBJTBL1\n"
+
+# Later files override earlier ones where they disagree
+STILL_FILES = (["still45678.txt"] +
+               ["still%02d.txt" % n for n in range(9, 17)] +
+               ["still_list.txt", "summary.txt"])
+FREQ_FILE = "byfreq.txt"
+TRANSLATE_FILE = "translate17.txt.gz"
+
+SOURCES = [TRANSLATE_FILE] + STILL_FILES + [FREQ_FILE]
+
+# Stored in the cost and frequency columns when the value is not known
+UNKNOWN = -1
+
+Row = namedtuple("Row", ["niemiec", "apgcode", "bits", "cost", "freq"])
+
+# Number of cells in an object from its apgcode or Niemiec ID
+def bit_count(niemiec, apgcode):
+
+    if apgcode.startswith("xs"):
+        return int(apgcode[2:apgcode.index("_")])
+
+    return int(niemiec.split(".")[0])
+
+# Sort key for Niemiec IDs, so that 16.43 comes before 16.100
+def niemiec_key(niemiec):
+
+    try:
+        return tuple(int(x) for x in niemiec.split("."))
+    except ValueError:
+        return (sys.maxsize, niemiec)
+
+def read_lines(filename):
+
+    if filename.endswith(".gz"):
+        f = gzip.open(filename)
+    else:
+        f = open(filename)
+
+    with f:
+        for s in f:
+            if not isinstance(s, str):
+                s = s.decode("ascii")
+            fields = s.split()
+            if fields:
+                yield fields
+
+def to_int(s):
+    try:
+        return int(s)
+    except ValueError:
+        return UNKNOWN
+
+# Join all of the text files into a list of rows
+def read_sources(directory="."):
+
+    rows = {}
+
+    def row_for(niemiec, apgcode):
+        if apgcode not in rows:
+            rows[apgcode] = [niemiec, apgcode, UNKNOWN, UNKNOWN]
+        return rows[apgcode]
+
+    for filename in SOURCES:
+
+        path = os.path.join(directory, filename)
+
+        if not os.path.exists(path):
+            continue
+
+        for fields in read_lines(path):
+
+            row = row_for(fields[0], fields[1])
+            row[0] = fields[0]
+
+            if len(fields) > 2:
+                row[2] = to_int(fields[2])
+            if len(fields) > 3:
+                row[3] = to_int(fields[3])
+
+    return [Row(niemiec, apgcode, bit_count(niemiec, apgcode), cost, freq)
+            for niemiec, apgcode, cost, freq in rows.values()]
+
+def to_bytes(a):
+    return a.tobytes() if hasattr(a, "tobytes") else a.tostring()
+
+def to_str(data):
+    return data if isinstance(data, str) else data.decode("ascii")
+
+def from_bytes(typecode, data):
+    a = array.array(typecode)
+    if hasattr(a, "frombytes"):
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+    return a
+
+class ObjectTable(object):
+
+    def __init__(self, niemiecs, apgcodes, bits, costs, freqs, cost_order):
+
+        self.niemiecs = niemiecs
+        self.apgcodes = apgcodes
+        self.bits = bits
+        self.costs = costs
+        self.freqs = freqs
+
+        # Row numbers ordered by cost, and the matching costs for bisection
+        self.cost_order = cost_order
+        self.sorted_costs = [costs[i] for i in cost_order]
+
+        self.apgcode_index = dict((code, i) for i, code in enumerate(apgcodes))
+        self.niemiec_index = dict((n, i) for i, n in enumerate(niemiecs))
+
+    @classmethod
+    def from_rows(cls, rows):
+
+        rows = sorted(rows, key=lambda r: (r.bits, niemiec_key(r.niemiec),
+                                           r.apgcode))
+
+        costs = array.array("i", [r.cost for r in rows])
+
+        # Unknown costs sort after everything else
+        cost_order = array.array("i", sorted(
+            (i for i in range(len(rows)) if costs[i] != UNKNOWN),
+            key=lambda i: (costs[i], i)))
+
+        return cls([r.niemiec for r in rows],
+                   [r.apgcode for r in rows],
+                   array.array("i", [r.bits for r in rows]),
+                   costs,
+                   array.array("d", [r.freq for r in rows]),
+                   cost_order)
+
+    def save(self, filename=TABLE):
+
+        niemiec_blob = "\n".join(self.niemiecs).encode("ascii")
+        apgcode_blob = "\n".join(self.apgcodes).encode("ascii")
+
+        header = "%d %d %d %d\n" % (len(self.apgcodes), len(self.cost_order),
+                                    len(niemiec_blob), len(apgcode_blob))
+
+        # Write to a temporary file then rename, so a reader never sees a
+        # half written table
+        temp = filename + ".tmp"
+
+        with open(temp, "wb") as f:
+            f.write(MAGIC)
+            f.write(header.encode("ascii"))
+            for a in [self.bits, self.costs, self.freqs, self.cost_order]:
+                f.write(to_bytes(a))
+            f.write(niemiec_blob)
+            f.write(apgcode_blob)
+
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp, filename)
+
+    @classmethod
+    def read(cls, filename=TABLE):
+
+        with open(filename, "rb") as f:
+
+            if f.readline() != MAGIC:
+                raise ValueError("%s is not an object table" % filename)
+
+            n, n_costs, niemiec_length, apgcode_length = map(
+                int, f.readline().split())
+
+            def column(typecode, length):
+                size = array.array(typecode).itemsize
+                return from_bytes(typecode, f.read(size * length))
+
+            bits = column("i", n)
+            costs = column("i", n)
+            freqs = column("d", n)
+            cost_order = column("i", n_costs)
+
+            niemiecs = to_str(f.read(niemiec_length)).split("\n")
+            apgcodes = to_str(f.read(apgcode_length)).split("\n")
+
+        return cls(niemiecs, apgcodes, bits, costs, freqs, cost_order)
+
+    # Load the cached table, rebuilding it first if any source is newer
+    @classmethod
+    def load(cls, directory="."):
+
+        filename = os.path.join(directory, TABLE)
+
+        sources = [os.path.join(directory, s) for s in SOURCES]
+        newest = max([os.path.getmtime(s) for s in sources
+                      if os.path.exists(s)] + [0])
+
+        if os.path.exists(filename) and os.path.getmtime(filename) >= newest:
+            try:
+                return cls.read(filename)
+            except (ValueError, EOFError):
+                pass
+
+        table = cls.from_rows(read_sources(directory))
+        table.save(filename)
+
+        return table
+
+    def __len__(self):
+        return len(self.apgcodes)
+
+    def row(self, i):
+
+        cost = self.costs[i]
+        freq = int(self.freqs[i])
+
+        return Row(self.niemiecs[i], self.apgcodes[i], self.bits[i],
+                   None if cost == UNKNOWN else cost,
+                   None if freq == UNKNOWN else freq)
+
+    def by_apgcode(self, apgcode):
+        i = self.apgcode_index.get(apgcode)
+        return None if i is None else self.row(i)
+
+    def by_niemiec(self, niemiec):
+        i = self.niemiec_index.get(niemiec)
+        return None if i is None else self.row(i)
+
+    # Look up either an apgcode or a Niemiec ID
+    def lookup(self, code):
+        row = self.by_apgcode(code)
+        return row if row is not None else self.by_niemiec(code)
+
+    # All objects with lo <= bits <= hi, in Niemiec order
+    def bits_range(self, lo, hi=None):
+
+        if hi is None:
+            hi = lo
+
+        start = bisect.bisect_left(self.bits, lo)
+        stop = bisect.bisect_right(self.bits, hi)
+
+        return [self.row(i) for i in range(start, stop)]
+
+    # All objects with a known cost and lo <= cost <= hi, cheapest first
+    def cost_range(self, lo, hi=None):
+
+        if hi is None:
+            hi = lo
+
+        start = bisect.bisect_left(self.sorted_costs, lo)
+        stop = bisect.bisect_right(self.sorted_costs, hi)
+
+        return [self.row(self.cost_order[i]) for i in range(start, stop)]
+
+    # Frequencies of all objects that have one, keyed by apgcode
+    def frequencies(self):
+        return dict((self.apgcodes[i], int(f))
+                    for i, f in enumerate(self.freqs) if f != UNKNOWN)
+
+def format_row(row):
+
+    cost = "-" if row.cost is None else row.cost
+    freq = "" if row.freq is None else row.freq
+
+    return "%-10s %-40s %-3s %s" % (row.niemiec, row.apgcode, cost, freq)
+
+def main(args):
+
+    if not args:
+        print("usage: python object_table.py CODE | bits LO [HI] | "
+              "cost LO [HI] | rebuild")
+        return 1
+
+    if args[0] == "rebuild":
+        if os.path.exists(TABLE):
+            os.remove(TABLE)
+        print(len(ObjectTable.load()), "objects")
+        return 0
+
+    table = ObjectTable.load()
+
+    if args[0] in ["bits", "cost"]:
+
+        lo = int(args[1])
+        hi = int(args[2]) if len(args) > 2 else lo
+
+        if args[0] == "bits":
+            rows = table.bits_range(lo, hi)
+        else:
+            rows = table.cost_range(lo, hi)
+
+        for row in rows:
+            print(format_row(row))
+
+        return 0
+
+    for code in args:
+        row = table.lookup(code)
+        print(format_row(row) if row is not None else "?? " + code)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,187 @@
+# pareto.py
+#
+# The trade-off between glider cost and number of steps for every object,
+# over the full graph of known edges.
+#
+# Each edge of a chain is a separate construction, so a chain that costs a
+# few more gliders but takes fewer steps is often the better synthesis.
+# For each object this finds the Pareto front of its chains: every
+# (cost, steps) such that no chain is both as cheap and as short, with
+# one chain for each.
+#
+# The search works in rounds. After round s every object has the cost of
+# its cheapest chain of at most s steps, and the front is the list of the
+# rounds where that cost went down. Only objects whose cost went down in
+# the last round can lower anything in the next, so each round only
+# extends those, and the search stops when a round changes nothing.
+# Edge costs are never negative, so a cheapest chain of at most s steps
+# never needs to visit an object twice, and the front is exact.
+#
+# Usage:
+#   python pareto.py build [--edges FILE ...]        write pareto.txt
+#   python pareto.py show APGCODE                    print the stored front
+#   python pareto.py within APGCODE STEPS            cheapest chain of at
+#                                                    most STEPS steps
+#
+# Edge files default to min_paths.txt. within reads the chain from
+# pareto.txt and its edges from the edge files (which --edges also sets).
+# pareto.txt has one line per point of each front, fewest steps first:
+#
+#   apgcode cost steps 0,code1,code2,...,apgcode
+
+from __future__ import print_function
+
+import sys
+
+from edges import edge_cost, read_edge_graph
+from kpaths import print_chain
+
+PARETO = "pareto.txt"
+
+# Compute the front of every object. Returns a dictionary from apgcode to
+# a list of (cost, path) pairs, fewest steps (and so most gliders) first,
+# where each path is a tuple of apgcodes starting with "0".
+def pareto_fronts(graph):
+
+    # For each object, a list of (cost, steps, parent, parent_label): the
+    # rounds where its cost went down, each with the object it was reached
+    # from and the index of the label there that was extended
+    labels = {"0": [(0, 0, None, None)]}
+    changed = ["0"]
+    steps = 0
+
+    while changed:
+
+        steps += 1
+        improved = {}
+
+        for node in changed:
+
+            cost = labels[node][-1][0]
+            label = len(labels[node]) - 1
+
+            for output, edge in graph.get(node, {}).items():
+
+                new_cost = cost + edge_cost(edge)
+
+                if output in improved:
+                    if new_cost >= improved[output][0]:
+                        continue
+                elif output in labels and new_cost >= labels[output][-1][0]:
+                    continue
+
+                improved[output] = (new_cost, steps, node, label)
+
+        for output, label in improved.items():
+            labels.setdefault(output, []).append(label)
+
+        changed = sorted(improved)
+
+    fronts = {}
+
+    for apgcode, front in labels.items():
+        if apgcode != "0":
+            fronts[apgcode] = [(cost, label_path(labels, apgcode, i))
+                               for i, (cost, _, _, _) in enumerate(front)]
+
+    return fronts
+
+# The chain of a label, following the parents back to "0"
+def label_path(labels, node, i):
+
+    path = []
+
+    while node is not None:
+        path.append(node)
+        _, _, node, i = labels[node][i]
+
+    return tuple(reversed(path))
+
+# The cheapest (cost, path) in a front with at most steps steps, or None
+def cheapest_within(front, steps):
+
+    best = None
+
+    for cost, path in front:
+        if len(path) - 1 <= steps:
+            best = cost, path
+
+    return best
+
+def write_fronts(fronts, filename=PARETO):
+
+    with open(filename, "w") as f:
+        for apgcode in sorted(fronts):
+            for cost, path in fronts[apgcode]:
+                f.write("%s %d %d %s\n" % (apgcode, cost, len(path) - 1,
+                                           ",".join(path)))
+
+def read_front(apgcode, filename=PARETO):
+
+    front = []
+    prefix = apgcode + " "
+
+    with open(filename) as f:
+        for s in f:
+            if s.startswith(prefix):
+                _, cost, _, path = s.split()
+                front.append((int(cost), tuple(path.split(","))))
+
+    return front
+
+def read_fronts(filename=PARETO):
+
+    fronts = {}
+
+    with open(filename) as f:
+        for s in f:
+            apgcode, cost, _, path = s.split()
+            fronts.setdefault(apgcode, []).append(
+                (int(cost), tuple(path.split(","))))
+
+    return fronts
+
+def main(args):
+
+    if not args:
+        print("usage: python pareto.py build | show APGCODE | "
+              "within APGCODE STEPS [--edges FILE ...]")
+        return 1
+
+    edge_files = ["min_paths.txt"]
+
+    if "--edges" in args:
+        i = args.index("--edges")
+        args, edge_files = args[:i], args[i+1:]
+
+    command, args = args[0], args[1:]
+
+    if command == "show":
+        for cost, path in read_front(args[0]):
+            print(cost, len(path) - 1, ",".join(path))
+        return 0
+
+    if command == "within":
+
+        best = cheapest_within(read_front(args[0]), int(args[1]))
+
+        if best is None:
+            print("No synthesis of %s in %s steps or fewer" % (args[0],
+                                                                args[1]))
+            return 1
+
+        print_chain(read_edge_graph(edge_files), *best)
+        return 0
+
+    if command == "build":
+        fronts = pareto_fronts(read_edge_graph(edge_files))
+        write_fronts(fronts)
+        print(len(fronts), "objects,",
+              sum(len(front) for front in fronts.values()), "chains")
+        return 0
+
+    print("Unknown command %r" % command)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
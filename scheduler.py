@@ -0,0 +1,385 @@
+# scheduler.py
+#
+# A persistent priority work queue for search, canonicalisation and
+# verification jobs. Jobs are kept in an sqlite database and ordered by a
+# score derived from the natural frequency of their object in byfreq.txt
+# and its current cost in min_paths.txt, so that a limited compute budget
+# goes to the objects that matter most first. A synthesis file has no
+# object of its own, so it is scored by the best scoring still life or
+# oscillator drawn in it: in a collection these are the objects the
+# syntheses start from, pass through and end with.
+#
+# Workers claim the best pending job with a time limited lease, renew the
+# lease while they work (optionally storing a checkpoint string that is
+# handed back if the job has to be restarted) and finally mark the job
+# done or failed. Jobs whose lease runs out are handed to the next worker,
+# unless they have already been tried MAX_ATTEMPTS times (eg. because
+# they keep killing their worker), in which case they are marked failed.
+#
+# Usage:
+#   python scheduler.py add KIND KEY [APGCODE]   kinds: synth, improve, verify
+#   python scheduler.py add-objects KIND         one job per object in byfreq.txt
+#   python scheduler.py add-files DIRECTORY      one synth job per file
+#   python scheduler.py rescore
+#   python scheduler.py claim WORKER
+#   python scheduler.py done JOB_ID WORKER [RESULT]
+#   python scheduler.py fail JOB_ID WORKER [ERROR]
+#   python scheduler.py list [N]
+
+from __future__ import print_function
+
+import math
+import os
+import sqlite3
+import sys
+import time
+
+from apgcode import canonise_many
+from cellset import CellSet, coords
+from edges import read_min_paths, chain_costs
+from lifesim import clusters
+from object_table import ObjectTable
+from tiles import rle_tiles
+
+DATABASE = "jobs.db"
+
+KINDS = ["synth", "improve", "verify"]
+
+# score = FREQ_WEIGHT * log10(1 + frequency) + COST_WEIGHT * cost
+FREQ_WEIGHT = 1.0
+COST_WEIGHT = 0.25
+
+# Cost assumed for objects with no known synthesis
+UNKNOWN_COST = 40
+
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+create table if not exists jobs (
+    id integer primary key,
+    kind text not null,
+    key text not null,
+    apgcode text not null default '',
+    score real not null default 0,
+    state text not null default 'pending',
+    worker text,
+    lease_expires real,
+    attempts integer not null default 0,
+    checkpoint text,
+    result text,
+    unique (kind, key)
+);
+create index if not exists jobs_by_score on jobs (state, score);
+"""
+
+class Scorer(object):
+
+    def __init__(self, paths_file="min_paths.txt",
+                 freq_weight=FREQ_WEIGHT, cost_weight=COST_WEIGHT):
+
+        self.frequencies = ObjectTable.load().frequencies()
+        self.costs = chain_costs(read_min_paths(paths_file))
+        self.freq_weight = freq_weight
+        self.cost_weight = cost_weight
+
+    def score(self, apgcode):
+
+        if not apgcode:
+            return 0.0
+
+        cost = self.costs.get(apgcode)
+        if cost is None:
+            cost = UNKNOWN_COST
+
+        frequency = self.frequencies.get(apgcode, 0)
+
+        return (self.freq_weight * math.log10(1 + frequency) +
+                self.cost_weight * cost)
+
+    # The best score of the objects drawn in a synthesis file, or 0 if it
+    # has none (or has gone)
+    def file_score(self, filename):
+
+        if not os.path.isfile(filename):
+            return 0.0
+
+        return max([self.score(apgcode) for apgcode in file_objects(filename)]
+                   or [0.0])
+
+    def job_score(self, kind, key, apgcode):
+
+        if kind == "synth" and not apgcode:
+            return self.file_score(key)
+
+        return self.score(apgcode)
+
+# The apgcodes of the still lifes and oscillators drawn in an RLE file,
+# read a tile at a time. Each object is taken from the tile holding its
+# first cell, objects bigger than the tile margin are missed.
+def file_objects(filename):
+
+    codes = set()
+
+    for (x0, y0, x1, y1), cells in rle_tiles(filename):
+
+        patterns = []
+
+        for group in clusters(CellSet(cells).keys()):
+            x, y = coords(min(group))
+            if x0 <= x < x1 and y0 <= y < y1:
+                patterns.append(CellSet.from_keys(sorted(group)).tolist())
+
+        # Anything that isn't periodic in place (gliders, partial
+        # syntheses) gives None
+        codes.update(apgcode for apgcode in canonise_many(patterns)
+                     if apgcode not in (None, "#"))
+
+    return codes
+
+class WorkQueue(object):
+
+    def __init__(self, filename=DATABASE, scorer=None):
+
+        # Autocommit mode, transactions are opened explicitly so that
+        # claiming a job is atomic across processes.
+        self.db = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+        self.scorer = scorer
+
+    def close(self):
+        self.db.close()
+
+    def _score(self, kind, key, apgcode, score):
+
+        if score is not None:
+            return score
+        if self.scorer is None:
+            self.scorer = Scorer()
+        return self.scorer.job_score(kind, key, apgcode)
+
+    # Add a job unless it is already queued. Returns True if it was added.
+    def add(self, kind, key, apgcode="", score=None):
+
+        if kind not in KINDS:
+            raise ValueError("Unknown job kind %r" % kind)
+
+        cursor = self.db.execute(
+            "insert or ignore into jobs (kind, key, apgcode, score) "
+            "values (?, ?, ?, ?)",
+            (kind, key, apgcode, self._score(kind, key, apgcode, score)))
+
+        return cursor.rowcount == 1
+
+    def add_many(self, jobs):
+
+        count = 0
+
+        self.db.execute("begin immediate")
+        try:
+            for kind, key, apgcode in jobs:
+                count += self.add(kind, key, apgcode)
+            self.db.execute("commit")
+        except:
+            self.db.execute("rollback")
+            raise
+
+        return count
+
+    # Recompute the score of every unfinished job, eg. after min_paths.txt
+    # or byfreq.txt has changed.
+    def rescore(self, scorer=None):
+
+        if scorer is not None:
+            self.scorer = scorer
+
+        rows = self.db.execute(
+            "select id, kind, key, apgcode from jobs where state in (?, ?)",
+            (PENDING, LEASED)).fetchall()
+
+        scores = [(self._score(kind, key, apgcode, None), job_id)
+                  for job_id, kind, key, apgcode in rows]
+
+        self.db.execute("begin immediate")
+        try:
+            for score, job_id in scores:
+                self.db.execute("update jobs set score = ? where id = ?",
+                                (score, job_id))
+            self.db.execute("commit")
+        except:
+            self.db.execute("rollback")
+            raise
+
+        return len(rows)
+
+    # Lease the best available job to a worker. Returns a tuple
+    # (job_id, kind, key, apgcode, checkpoint) or None if there is no work.
+    # Expired jobs that have used up their attempts are marked failed on
+    # the way.
+    def claim(self, worker, lease_seconds=LEASE_SECONDS, kinds=KINDS):
+
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+
+        self.db.execute("begin immediate")
+        try:
+            while True:
+
+                row = self.db.execute(
+                    "select id, kind, key, apgcode, checkpoint, state, "
+                    "attempts from jobs "
+                    "where kind in (%s) and (state = ? or "
+                    "(state = ? and lease_expires < ?)) "
+                    "order by score desc, id limit 1" % marks,
+                    list(kinds) + [PENDING, LEASED, now]).fetchone()
+
+                if row is None:
+                    break
+
+                if row[5] == LEASED and row[6] >= MAX_ATTEMPTS:
+                    self.db.execute(
+                        "update jobs set state = ?, worker = null, "
+                        "lease_expires = null, result = ? where id = ?",
+                        (FAILED, "lease expired", row[0]))
+                    continue
+
+                self.db.execute(
+                    "update jobs set state = ?, worker = ?, lease_expires = ?,"
+                    " attempts = attempts + 1 where id = ?",
+                    (LEASED, worker, now + lease_seconds, row[0]))
+
+                row = row[:5]
+                break
+
+            self.db.execute("commit")
+        except:
+            self.db.execute("rollback")
+            raise
+
+        return row
+
+    def _update(self, job_id, worker, sql, args):
+
+        cursor = self.db.execute(
+            sql + " where id = ? and state = ? and worker = ?",
+            tuple(args) + (job_id, LEASED, worker))
+
+        # The lease has expired and the job was given to someone else
+        if cursor.rowcount != 1:
+            raise LeaseLost(job_id, worker)
+
+    # Extend a lease, optionally recording how far the worker has got
+    def heartbeat(self, job_id, worker, checkpoint=None,
+                  lease_seconds=LEASE_SECONDS):
+
+        if checkpoint is None:
+            self._update(job_id, worker, "update jobs set lease_expires = ?",
+                         [time.time() + lease_seconds])
+        else:
+            self._update(job_id, worker,
+                         "update jobs set lease_expires = ?, checkpoint = ?",
+                         [time.time() + lease_seconds, checkpoint])
+
+    def complete(self, job_id, worker, result=""):
+
+        self._update(job_id, worker,
+                     "update jobs set state = ?, lease_expires = null, "
+                     "result = ?", [DONE, result])
+
+    # Give up on a job. It goes back in the queue until it has been tried
+    # MAX_ATTEMPTS times.
+    def fail(self, job_id, worker, error=""):
+
+        attempts, = self.db.execute("select attempts from jobs where id = ?",
+                                    (job_id,)).fetchone()
+
+        state = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+
+        self._update(job_id, worker,
+                     "update jobs set state = ?, worker = null, "
+                     "lease_expires = null, result = ?", [state, error])
+
+    def jobs(self, limit=None, states=(PENDING, LEASED)):
+
+        marks = ",".join("?" * len(states))
+        sql = ("select id, kind, key, apgcode, score, state, worker, attempts "
+               "from jobs where state in (%s) order by score desc, id" % marks)
+
+        if limit is not None:
+            sql += " limit %d" % limit
+
+        return self.db.execute(sql, tuple(states)).fetchall()
+
+    def counts(self):
+        return dict(self.db.execute(
+            "select state, count(*) from jobs group by state").fetchall())
+
+class LeaseLost(Exception):
+
+    def __init__(self, job_id, worker):
+        Exception.__init__(self, "Job %d is no longer leased to %s" %
+                           (job_id, worker))
+
+def main(args):
+
+    if not args:
+        print("usage: python scheduler.py "
+              "add|add-objects|add-files|rescore|claim|done|fail|list ...")
+        return 1
+
+    queue = WorkQueue()
+    command, args = args[0], args[1:]
+
+    if command == "add":
+        if len(args) > 2:
+            apgcode = args[2]
+        elif args[0] != "synth":
+            apgcode = args[1]
+        else:
+            apgcode = ""
+        queue.add(args[0], args[1], apgcode)
+
+    elif command == "add-objects":
+        frequencies = ObjectTable.load().frequencies()
+        print(queue.add_many((args[0], apgcode, apgcode)
+                             for apgcode in frequencies), "jobs added")
+
+    elif command == "add-files":
+        print(queue.add_many(("synth", os.path.join(args[0], filename), "")
+                             for filename in sorted(os.listdir(args[0]))),
+              "jobs added")
+
+    elif command == "rescore":
+        print(queue.rescore(), "jobs rescored")
+
+    elif command == "claim":
+        job = queue.claim(args[0])
+        if job is None:
+            return 1
+        print(" ".join("" if x is None else str(x) for x in job))
+
+    elif command == "done":
+        queue.complete(int(args[0]), args[1], " ".join(args[2:]))
+
+    elif command == "fail":
+        queue.fail(int(args[0]), args[1], " ".join(args[2:]))
+
+    elif command == "list":
+        for job in queue.jobs(int(args[0]) if args else None):
+            print("%d %s %s %s %.3f %s %s %d" % job)
+        print(queue.counts())
+
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    queue.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
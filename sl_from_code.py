@@ -1,5 +1,10 @@
 import golly as g
-import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from object_table import ObjectTable, format_row
 
 chars = "0123456789abcdefghijklmnopqrstuvwxyz"
 
@@ -35,12 +40,11 @@ def decodeCanon(apgcode):
 
 code = g.getstring("Enter code:")
 
-for s in gzip.open("translate17.txt.gz"):
-    niemiec, apg = s.split()
-    if code == apg or code == niemiec:
-        g.new('')
-        g.putcells(decodeCanon(apg))
-        g.show(s)
-        g.exit()
+row = ObjectTable.load().lookup(code)
 
-g.show("Didn't find code")
+if row is not None:
+    g.new('')
+    g.putcells(decodeCanon(row.apgcode))
+    g.show(format_row(row))
+else:
+    g.show("Didn't find code")
@@ -0,0 +1,292 @@
+# tiles.py
+#
+# Streaming access to very large RLE files, so that a collection of
+# thousands of syntheses can be worked through without ever holding the
+# whole pattern.
+#
+# The plane is cut into square tiles of TILE_SIZE cells aligned to
+# multiples of TILE_SIZE. Each tile comes with the cells of a margin of
+# TILE_MARGIN around it, so that anything starting in the tile can be seen
+# whole as long as it isn't bigger than the margin. The file is read once,
+# from top to bottom, one row at a time.
+#
+# The cells of the tiles being read are kept in a Spill, which writes them
+# out to temporary files once more than SPILL_CELLS cells are held, and
+# each tile is read back when the file has been read past its bottom edge.
+# So however wide or tall the file is, what is held at once is one row,
+# SPILL_CELLS cells and the tile being handed out.
+#
+# Cells in states other than o (or A, state 1) are treated as dead, as in
+# lifesim.parse.
+#
+# Rows are read as arrays of x coordinates and tiles built up as arrays
+# of cells (see cellset.py), so no object is made per cell.
+
+import os
+import shutil
+import tempfile
+from array import array
+from bisect import bisect_left
+
+from cellset import interleave
+
+# canonv11.py needs a margin of at least its TILE_GUARD, 520 cells
+TILE_SIZE = 2048
+TILE_MARGIN = 576
+
+CHUNK_SIZE = 1 << 16
+
+# Cells held in memory by a Spill before they are written out
+SPILL_CELLS = 1 << 20
+
+# Iterate over the rows of an RLE file that have live cells, in order, as
+# (y, xs) where xs is an array of the x coordinates of the row's live
+# cells in increasing order
+def rle_rows(filename):
+
+    with open(filename) as f:
+
+        # Skip comments and the header line
+        pending = ""
+        while True:
+            s = f.readline()
+            if s.startswith("#") or (s and not s.strip()):
+                continue
+            if not s.lstrip().startswith("x"):
+                pending = s
+            break
+
+        x = y = 0
+        xs = array("i")
+        count = 0
+        prefix = False
+
+        while True:
+
+            data = pending or f.read(CHUNK_SIZE)
+            pending = ""
+
+            if not data:
+                break
+
+            for ch in data:
+
+                if ch.isdigit():
+                    count = 10 * count + int(ch)
+                    continue
+
+                if ch in " \t\r\n":
+                    continue
+
+                n = count or 1
+                count = 0
+
+                if ch == "o" or (ch == "A" and not prefix):
+                    xs.extend(range(x, x + n))
+                    x += n
+                elif "p" <= ch <= "y":
+                    # First letter of a two letter state, the count
+                    # applies to the state as a whole
+                    prefix = True
+                    count = n
+                    continue
+                elif ch == "$":
+                    if xs:
+                        yield y, xs
+                        xs = array("i")
+                    x = 0
+                    y += n
+                elif ch == "!":
+                    data = ""
+                    break
+                else:
+                    x += n
+
+                prefix = False
+
+            if not data:
+                break
+
+        if xs:
+            yield y, xs
+
+# Iterate over the live cells of an RLE file as (x, y) pairs, in the order
+# they appear, ie. by rows from the top
+def rle_cells(filename):
+
+    for y, xs in rle_rows(filename):
+        for x in xs:
+            yield x, y
+
+# Flat cells of the part of a row with x0 <= x < x1
+def row_cells(y, xs, x0, x1):
+
+    lo = bisect_left(xs, x0)
+    hi = bisect_left(xs, x1, lo)
+
+    return interleave(xs[lo:hi], array("i", [y]) * (hi - lo))
+
+# Flat cell arrays kept by key, written out to a temporary directory
+# whenever more than limit cells are held
+class Spill(object):
+
+    def __init__(self, limit=SPILL_CELLS):
+
+        self.limit = limit
+        self.held = 0
+        self.buffers = {}
+        self.files = {}
+        self.directory = None
+        self.written = 0
+
+    def add(self, k, cells):
+
+        if k not in self.buffers:
+            self.buffers[k] = array("i")
+
+        self.buffers[k].extend(cells)
+        self.held += len(cells) // 2
+
+        if self.held > self.limit:
+            self.flush()
+
+    def flush(self):
+
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="tiles-")
+
+        for k, cells in self.buffers.items():
+
+            if k not in self.files:
+                self.files[k] = os.path.join(self.directory, str(self.written))
+                self.written += 1
+
+            with open(self.files[k], "ab") as f:
+                cells.tofile(f)
+
+        self.buffers = {}
+        self.held = 0
+
+    def keys(self):
+        return set(self.buffers) | set(self.files)
+
+    # All the cells added under k, which are then forgotten
+    def take(self, k):
+
+        cells = array("i")
+        filename = self.files.pop(k, None)
+
+        if filename is not None:
+            with open(filename, "rb") as f:
+                cells.fromfile(f, os.path.getsize(filename) // cells.itemsize)
+            os.remove(filename)
+
+        if k in self.buffers:
+            buffered = self.buffers.pop(k)
+            self.held -= len(buffered) // 2
+            cells.extend(buffered)
+
+        return cells
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+# Iterate over the tiles of an RLE file that contain live cells, as
+# (core, cells): core is (x0, y0, x1, y1), the tile's cells being those
+# with x0 <= x < x1 and y0 <= y < y1, and cells is a flat list of all
+# the live cells within margin of the tile. Tiles come a band at a time
+# from the top, and from left to right within a band.
+def rle_tiles(filename, size=TILE_SIZE, margin=TILE_MARGIN, limit=SPILL_CELLS):
+
+    if margin >= size:
+        raise ValueError("tile margin must be less than the tile size")
+
+    spill = Spill(limit)
+
+    # The columns of the tiles with cells in each band being read
+    owned = {}
+
+    try:
+        for y, xs in rle_rows(filename):
+
+            # The bands whose regions the file has been read past
+            for band in sorted(owned):
+                if y >= (band + 1) * size + margin:
+                    for tile in band_tiles(spill, owned.pop(band), band, size):
+                        yield tile
+
+            columns = set(x // size for x in xs)
+
+            # Cells of the row within margin of each tile next to one with
+            # cells, as margin is less than the tile size
+            pieces = []
+            for column in sorted(set(c + dc for c in columns
+                                     for dc in (-1, 0, 1))):
+                cells = row_cells(y, xs, column * size - margin,
+                                  (column + 1) * size + margin)
+                if cells:
+                    pieces.append((column, cells))
+
+            for band in range((y - margin) // size, (y + margin) // size + 1):
+
+                tiles = owned.setdefault(band, set())
+                if y // size == band:
+                    tiles.update(columns)
+
+                for column, cells in pieces:
+                    spill.add((band, column), cells)
+
+        for band in sorted(owned):
+            for tile in band_tiles(spill, owned[band], band, size):
+                yield tile
+
+    finally:
+        spill.close()
+
+# The tiles of one band with cells, from left to right, taken out of the
+# spill along with the margins of the tiles around them
+def band_tiles(spill, columns, band, size):
+
+    y0 = band * size
+
+    for k in sorted(k for k in spill.keys() if k[0] == band):
+
+        cells = spill.take(k)
+
+        if k[1] in columns:
+            x0 = k[1] * size
+            yield (x0, y0, x0 + size, y0 + size), cells.tolist()
+
+# Iterate over the live cells of an RLE file in each of a list of
+# rectangles (x0, y0, x1, y1), in one pass, as (i, cells) for the ith
+# rectangle, where cells is a flat list. Each rectangle comes as soon as
+# the file has been read past its bottom edge.
+def rle_region_cells(filename, rects, limit=SPILL_CELLS):
+
+    spill = Spill(limit)
+
+    # Indexes of the rectangles by top edge, and of those being read
+    waiting = sorted(range(len(rects)), key=lambda i: rects[i][1], reverse=True)
+    reading = []
+
+    try:
+        for y, xs in rle_rows(filename):
+
+            while waiting and rects[waiting[-1]][1] <= y:
+                reading.append(waiting.pop())
+
+            for i in [i for i in reading if rects[i][3] <= y]:
+                reading.remove(i)
+                yield i, spill.take(i).tolist()
+
+            for i in reading:
+                cells = row_cells(y, xs, rects[i][0], rects[i][2])
+                if cells:
+                    spill.add(i, cells)
+
+        for i in reading + waiting[::-1]:
+            yield i, spill.take(i).tolist()
+
+    finally:
+        spill.close()
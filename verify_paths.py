@@ -0,0 +1,248 @@
+# verify_paths.py
+#
+# Check by simulation that every edge in min_paths.txt (or any edge file)
+# works as described in README.md, and that every object's chain of edges
+# leads back to "0".
+#
+# For each edge the input object is drawn at the origin with its gliders
+# at time 0 and run alongside the expected result, the output object
+# advanced by `phase` and moved by `transform`. The edge works once the
+# two are equal, which then holds for all later generations. An edge
+# fails if the input settles into something that repeats with the
+# output's period but isn't the output, or hasn't settled after
+# MAX_GENERATIONS.
+#
+# Edges are grouped by input object, so each input is decoded once, and
+# the groups are checked on all cores with lifesim.
+#
+# Usage:
+#   python verify_paths.py [--out broken.txt] [EDGE_FILE ...]
+#
+# Edge files default to min_paths.txt. Every failure is written as the
+# edge followed by two more fields, "reason;detail":
+#
+#   mismatch;T     settled at generation T into the wrong pattern
+#   unsettled;T    still changing at generation T (= MAX_GENERATIONS)
+#   invalid;WHAT   the edge itself is malformed
+#   missing;CODE   nothing in the files synthesises the input CODE
+#   loop;CODE      the chain runs round a loop through CODE
+#   upstream;CODE  the chain passes through the broken edge for CODE
+#
+# The first eight fields are an ordinary edge, so the file can be read
+# back with edges.read_edges.
+
+from __future__ import print_function
+
+import multiprocessing
+import sys
+import time
+
+from apgcode import code_period, decodeCanon
+from cellset import CellSet
+from edges import edge_from_string, edge_to_string, read_min_paths
+from lifesim import evolve, life_step, parse
+from object_store import get_store
+
+MAX_GENERATIONS = 1000
+
+BROKEN = "broken.txt"
+
+GLIDERS = [(parse("3o$2bo$bo!", -2, 0), 1, -1),   #NE
+           (parse("bo$2bo$3o!", -2, -2), 1, 1),   #SE
+           (parse("bo$o$3o!", 0, -2), -1, 1),     #SW
+           (parse("3o$o$bo!", 0, 0), -1, -1)]     #NW
+
+GLIDER_PHASES = [[CellSet(evolve(glider, phase)) for phase in range(4)]
+                 for glider, _, _ in GLIDERS]
+
+MATRICES = [(1, 0, 0, 1), (-1, 0, 0, 1), (1, 0, 0, -1), (-1, 0, 0, -1),
+            (0, 1, 1, 0), (0, -1, 1, 0), (0, 1, -1, 0), (0, -1, -1, 0)]
+
+# Keys of all the gliders of an edge at time 0
+def glider_keys(glider_lists):
+
+    keys = set()
+
+    for direction, glider_list in enumerate(glider_lists):
+
+        _, vx, vy = GLIDERS[direction]
+
+        for lane, timing in glider_list:
+            phase = timing % 4
+            d = (timing - phase) // 4
+            keys.update(GLIDER_PHASES[direction][phase].translate(
+                lane + d * vx, d * vy).keys())
+
+    return keys
+
+# Every phase of an object as a list of key sets, or None if its period
+# doesn't match its apgcode
+def object_phases(apgcode, cache={}):
+
+    if apgcode in cache:
+        return cache[apgcode]
+
+    info = get_store().get(apgcode)
+    phases = None
+
+    if info is not None and info.period == code_period(apgcode):
+        phases = [CellSet(cells).keys() for cells in info.phases]
+
+    cache[apgcode] = phases
+    return phases
+
+def transform_keys(keys, transform):
+    return CellSet.from_keys(keys).transform(*transform).keys()
+
+# Check one edge. Returns None if it works, else (reason, detail).
+def check_edge(edge, input_keys):
+
+    input_code, output_code, phase, glider_lists, transform = edge
+
+    if input_code != "0" and object_phases(input_code) is None:
+        return "invalid", "input"
+
+    phases = object_phases(output_code)
+
+    if phases is None:
+        return "invalid", "output"
+
+    period = len(phases)
+
+    if phase >= period:
+        return "invalid", "phase"
+
+    if tuple(transform[2:]) not in MATRICES:
+        return "invalid", "transform"
+
+    expected = [transform_keys(phases[(phase + t) % period], transform)
+                for t in range(period)]
+
+    live = input_keys | glider_keys(glider_lists)
+    history = []
+
+    for t in range(MAX_GENERATIONS + 1):
+
+        if live == expected[t % period]:
+            return None
+
+        # Settled into something with the output's period that isn't the
+        # output, so it never will be
+        if len(history) >= period and live == history[-period]:
+            return "mismatch", str(t - period)
+
+        history.append(live)
+        del history[:-period]
+        live = life_step(live)
+
+    return "unsettled", str(MAX_GENERATIONS)
+
+# Check a group of edges that share an input. Returns a list of
+# (edge, reason, detail) for the failures.
+def check_group(group):
+
+    input_code, lines = group
+    input_keys = CellSet(decodeCanon(input_code)).keys()
+
+    failures = []
+
+    for s in lines:
+        edge = edge_from_string(s)
+        result = check_edge(edge, input_keys)
+        if result is not None:
+            failures.append((s, ) + result)
+
+    return failures
+
+# Failures caused by the chains rather than the edges themselves
+def check_chains(min_paths, broken):
+
+    failures = []
+
+    for apgcode, edge in sorted(min_paths.items()):
+
+        if apgcode in broken:
+            continue
+
+        seen = set([apgcode])
+        code = edge[0]
+
+        while code != "0":
+
+            if code in broken:
+                reason = "upstream"
+                break
+
+            if code not in min_paths:
+                reason = "missing"
+                break
+
+            if code in seen:
+                reason = "loop"
+                break
+
+            seen.add(code)
+            code = min_paths[code][0]
+
+        else:
+            continue
+
+        failures.append((edge_to_string(edge), reason, code))
+
+    return failures
+
+def verify(filenames, out=BROKEN, workers=None):
+
+    groups = {}
+    count = 0
+
+    for filename in filenames:
+        with open(filename) as f:
+            for s in f:
+                s = s.strip()
+                if s:
+                    groups.setdefault(s.split(";", 1)[0], []).append(s)
+                    count += 1
+
+    # Biggest groups first so the pool isn't left waiting on one at the end
+    groups = sorted(groups.items(), key=lambda group: -len(group[1]))
+
+    pool = multiprocessing.Pool(workers)
+    failures = []
+    for result in pool.imap_unordered(check_group, groups):
+        failures.extend(result)
+    pool.close()
+    pool.join()
+
+    min_paths = {}
+    for filename in filenames:
+        min_paths.update(read_min_paths(filename))
+
+    broken = set(s.split(";", 2)[1] for s, _, _ in failures)
+    chain_failures = check_chains(min_paths, broken)
+
+    with open(out, "w") as f:
+        for s, reason, detail in sorted(failures) + chain_failures:
+            f.write("%s;%s;%s\n" % (s, reason, detail))
+
+    return count, len(failures), len(chain_failures)
+
+def main(args):
+
+    out = BROKEN
+
+    if "--out" in args:
+        i = args.index("--out")
+        out = args[i+1]
+        args = args[:i] + args[i+2:]
+
+    start = time.time()
+    count, failures, chain_failures = verify(args or ["min_paths.txt"], out)
+
+    print("%d edges checked in %.1fs: %d broken edges, %d broken chains" %
+          (count, time.time() - start, failures, chain_failures))
+
+    return 1 if failures or chain_failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
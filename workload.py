@@ -0,0 +1,303 @@
+# workload.py
+#
+# Synthetic collection files for load testing the canonicaliser, with the
+# edges it should find in them.
+#
+# Edges are drawn at random from min_paths.txt and each one is drawn as
+# its input object with the gliders on their way in, rewound by a random
+# number of generations (up to --rewind) and in a random one of the 8
+# orientations. The syntheses are laid out on a square grid, each in a
+# slot big enough for the largest of them plus --spacing cells, so the
+# spacing sets how densely they are packed. canonv11.py looks 1024
+# generations ahead, in which time anything a synthesis sends out can
+# travel 256 cells, so syntheses much closer than that may interact.
+#
+# With --junk F, a fraction F of extra slots each hold a lone glider in a
+# random direction and phase. The canonicaliser finds no edge in them and
+# writes them to errors/ as failures.
+#
+# The pattern is written as RLE, a row of slots at a time, and the
+# expected edges are written in the 8-field format, one per synthesis in
+# the order of the grid. Since every edge in min_paths.txt is in
+# canonical form, canonising the synthesis should give back exactly that
+# edge.
+#
+# Usage:
+#   python workload.py generate OUT.rle COUNT [--spacing N] [--junk F]
+#                      [--rewind N] [--seed N] [--expected expected.txt]
+#                      [--edges min_paths.txt]
+#   python workload.py check EXPECTED_FILE EDGE_FILE
+#   python workload.py check-tiles OUT.rle
+#
+# check compares the edges a canonicaliser found (eg. edges.txt) with the
+# expected ones, counting each edge as many times as it occurs.
+#
+# check-tiles writes TILE_CHECK to OUT.rle and checks that get_syntheses
+# and get_syntheses_tiled in canonv11.py both find it as one synthesis,
+# with the default tiles and with tiles small enough that it has to be
+# stitched back together. Like canonv11.py it needs Python 2.
+#
+# Don't write the expected edges into synths/, canonv11.py opens every
+# file there as a pattern.
+
+from __future__ import print_function
+
+import math
+import random
+import sys
+from collections import Counter
+
+from canonv11 import TILE_GUARD, g, get_syntheses, get_syntheses_tiled
+from catalogue import row_tokens, run_length
+from cellset import CellSet
+from edges import edge_to_string, read_edges
+from lifesim import evolve, parse, transform
+from object_store import get_store
+from tiles import TILE_MARGIN, TILE_SIZE
+from verify_paths import MATRICES, glider_keys
+
+EXPECTED = "expected.txt"
+
+SPACING = 256
+
+MAX_REWIND = 40
+
+# Golly wraps RLE lines at 70 characters
+LINE_LENGTH = 70
+
+# One glider of each direction, as in verify_paths.GLIDERS
+JUNK_GLIDERS = ["3o$2bo$bo!", "bo$2bo$3o!", "bo$o$3o!", "3o$o$bo!"]
+
+# An SE glider and an NW glider 500 cells down and to the right of it,
+# which meet about 1000 generations later. With 1024 by 1024 tiles and a
+# margin of 256, get_syntheses_tiled once lost the NW glider and took the
+# SE one as a synthesis on its own.
+TILE_CHECK = [("bo$2bo$3o!", 784, 784), ("3o$o$bo!", 1284, 1284)]
+
+# The cells of an edge's input and gliders, rewound by the given number of
+# generations, with matrix m applied and moved so that the top left
+# corner of the bounding box is at the origin
+def render_edge(edge, rewind, m):
+
+    input_code, _, _, glider_lists, _ = edge
+
+    rewound = [[(lane, timing - rewind) for lane, timing in glider_list]
+               for glider_list in glider_lists]
+
+    cells = (get_store().phase_cells(input_code, -rewind) +
+             CellSet.from_keys(glider_keys(rewound)).tolist())
+
+    cells = transform(cells, 0, 0, *m)
+
+    return transform(cells, -min(cells[::2]), -min(cells[1::2]))
+
+# Draw count syntheses (and the junk slots) at random. Returns the list
+# of slots, each (edge, cells) with edge None for junk.
+def make_slots(edges, count, junk, rewind, rng):
+
+    slots = []
+
+    for _ in range(count):
+        edge = rng.choice(edges)
+        cells = render_edge(edge, rng.randint(0, rewind), rng.choice(MATRICES))
+        slots.append((edge, cells))
+
+    for _ in range(int(round(junk * count))):
+        slots.append((None, junk_glider(rng)))
+
+    rng.shuffle(slots)
+    return slots
+
+# A lone glider in a random direction and phase
+def junk_glider(rng):
+
+    cells = evolve(parse(rng.choice(JUNK_GLIDERS)), rng.randrange(4))
+    return transform(cells, -min(cells[::2]), -min(cells[1::2]))
+
+# Writes RLE tokens, wrapping lines as Golly does
+class RLEWriter(object):
+
+    def __init__(self, f):
+        self.f = f
+        self.line = []
+        self.length = 0
+
+    def add(self, token):
+
+        if self.length + len(token) > LINE_LENGTH:
+            self.f.write("".join(self.line) + "\n")
+            self.line = []
+            self.length = 0
+
+        self.line.append(token)
+        self.length += len(token)
+
+    def close(self):
+        self.add("!")
+        self.f.write("".join(self.line) + "\n")
+
+def write_grid(filename, slots, spacing):
+
+    size = max(max(max(cells[::2]), max(cells[1::2])) + 1
+               for _, cells in slots)
+    pitch = size + spacing
+    columns = int(math.ceil(math.sqrt(len(slots))))
+    grid_rows = [slots[i:i+columns] for i in range(0, len(slots), columns)]
+
+    # The bounding box of the whole pattern, for the header
+    width = max(pitch * i + max(cells[::2]) + 1
+                for row in grid_rows for i, (_, cells) in enumerate(row))
+    height = max(pitch * j + max(cells[1::2]) + 1
+                 for j, row in enumerate(grid_rows) for _, cells in row)
+
+    with open(filename, "w") as f:
+
+        f.write("x = %d, y = %d, rule = B3/S23\n" % (width, height))
+        out = RLEWriter(f)
+        last_y = 0
+
+        for j, row in enumerate(grid_rows):
+
+            rows = {}
+            for i, (_, cells) in enumerate(row):
+                for k in range(0, len(cells), 2):
+                    rows.setdefault(pitch * j + cells[k+1], []).append(
+                        pitch * i + cells[k])
+
+            for y in sorted(rows):
+
+                xs = sorted(rows[y])
+
+                if y > last_y:
+                    out.add(run_length(y - last_y, "$"))
+                if xs[0] > 0:
+                    out.add(run_length(xs[0], "b"))
+                for token in row_tokens(xs):
+                    out.add(token)
+
+                last_y = y
+
+        out.close()
+
+def generate(filename, count, spacing=SPACING, junk=0.0, rewind=MAX_REWIND,
+             seed=None, expected=EXPECTED, edge_file="min_paths.txt"):
+
+    rng = random.Random(seed)
+    edges = list(read_edges(edge_file))
+
+    slots = make_slots(edges, count, junk, rewind, rng)
+    write_grid(filename, slots, spacing)
+
+    with open(expected, "w") as f:
+        for edge, _ in slots:
+            if edge is not None:
+                f.write(edge_to_string(edge) + "\n")
+
+    return len(slots)
+
+# Compare two edge files as multisets. Returns the edges only in the first
+# and the edges only in the second.
+def compare(expected_file, found_file):
+
+    expected = Counter(edge_to_string(e) for e in read_edges(expected_file))
+    found = Counter(edge_to_string(e) for e in read_edges(found_file))
+
+    return expected - found, found - expected
+
+# Write TILE_CHECK to filename and find its syntheses with get_syntheses
+# and with get_syntheses_tiled for each (size, margin) of the tiles.
+# Returns the one synthesis expected and a list of (size, margin, whole,
+# tiled) with the syntheses found, each as a sorted list of sorted lists
+# of (x, y).
+def check_tiles(filename, tilings=((TILE_SIZE, TILE_MARGIN),
+                                   (TILE_GUARD + 80, TILE_GUARD))):
+
+    cells = []
+    for rle, x, y in TILE_CHECK:
+        cells += parse(rle, x, y)
+
+    write_grid(filename, [(None, cells)], 0)
+
+    def normal(synths):
+        return sorted(sorted(zip(s[::2], s[1::2])) for s in synths)
+
+    g.open(filename)
+    whole = normal(get_syntheses(1))
+
+    return normal([cells]), [
+        (size, margin, whole,
+         normal(get_syntheses_tiled(filename, size, margin, 1)))
+        for size, margin in tilings]
+
+def main(args):
+
+    if len(args) < 2:
+        print("usage: python workload.py generate OUT.rle COUNT [--spacing N] "
+              "[--junk F] [--rewind N] [--seed N] [--expected FILE] "
+              "[--edges FILE] | check EXPECTED_FILE EDGE_FILE | "
+              "check-tiles OUT.rle")
+        return 1
+
+    command, args = args[0], args[1:]
+
+    if command == "generate":
+
+        options = {"--spacing": SPACING, "--junk": 0.0, "--rewind": MAX_REWIND,
+                   "--seed": None, "--expected": EXPECTED,
+                   "--edges": "min_paths.txt"}
+
+        for name in list(options):
+            if name in args:
+                i = args.index(name)
+                value = args[i+1]
+                if name == "--junk":
+                    value = float(value)
+                elif name in ("--spacing", "--rewind", "--seed"):
+                    value = int(value)
+                options[name] = value
+                args = args[:i] + args[i+2:]
+
+        slots = generate(args[0], int(args[1]), options["--spacing"],
+                         options["--junk"], options["--rewind"],
+                         options["--seed"], options["--expected"],
+                         options["--edges"])
+
+        print("%d slots written to %s, expected edges in %s" %
+              (slots, args[0], options["--expected"]))
+
+    elif command == "check":
+
+        missing, unexpected = compare(args[0], args[1])
+
+        for s in sorted(missing.elements()):
+            print("missing", s)
+        for s in sorted(unexpected.elements()):
+            print("unexpected", s)
+
+        print("%d missing, %d unexpected" % (sum(missing.values()),
+                                             sum(unexpected.values())))
+
+        return 1 if missing or unexpected else 0
+
+    elif command == "check-tiles":
+
+        failed = 0
+        expected, results = check_tiles(args[0])
+
+        for size, margin, whole, tiled in results:
+            ok = whole == tiled == expected
+            failed += not ok
+            print("size %d, margin %d: %d syntheses, %d tiled, %s" %
+                  (size, margin, len(whole), len(tiled),
+                   "ok" if ok else "MISMATCH"))
+
+        return 1 if failed else 0
+
+    else:
+        print("Unknown command %r" % command)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))